@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Compares the STL writers on a large tessellation: OCCT's StlAPI_Writer in ASCII and binary
+mode, which write to a file that is then read back, against the NumPy binary writer.
+
+    python benchmarks/bench_stl.py --deflection 0.01 --repeat 3
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import cadquery as cq
+from OCP.StlAPI import StlAPI_Writer
+from cq_cli.cqcodecs import tessellation
+
+import stl_writer
+
+
+def make_model(count):
+    """
+    Makes a grid of spheres with holes through them, which meshes into a lot of triangles.
+    """
+    spheres = cq.Workplane("XY").rarray(12, 12, count, count).sphere(5)
+    holes = (
+        cq.Workplane("XY")
+        .workplane(offset=-6)
+        .rarray(12, 12, count, count)
+        .circle(1.5)
+        .extrude(12)
+    )
+    return spheres.cut(holes).val()
+
+
+def stlapi_writer(shape, ascii_mode):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_file = os.path.join(temp_dir, "bench.stl")
+        writer = StlAPI_Writer()
+        writer.ASCIIMode = ascii_mode
+        writer.Write(shape.wrapped, temp_file)
+        with open(temp_file, "rb") as file:
+            return file.read()
+
+
+def time_writer(write, repeat):
+    """
+    Returns the best time of several runs of a writer and the size of what it wrote.
+    """
+    best = None
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(write())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best == None else min(best, elapsed)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=6, help="Spheres along each side")
+    parser.add_argument("--deflection", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="File to write the results to as JSON")
+    args = parser.parse_args()
+
+    shape = make_model(args.count)
+    tessellation.TessellationCache().mesh(shape, args.deflection, 0.1)
+    triangles = len(stl_writer.triangulation_arrays(shape)[1])
+
+    writers = {
+        "stlapi_ascii": lambda: stlapi_writer(shape, True),
+        "stlapi_binary": lambda: stlapi_writer(shape, False),
+        "numpy_binary": lambda: stl_writer.write_binary_stl(shape),
+    }
+
+    results = {"triangles": triangles, "writers": {}}
+    print("%d triangles" % triangles)
+    print("%-16s %10s %14s" % ("writer", "best (s)", "size (bytes)"))
+    for name, write in writers.items():
+        seconds, size = time_writer(write, args.repeat)
+        results["writers"][name] = {"seconds": seconds, "bytes": size}
+        print("%-16s %10.4f %14d" % (name, seconds, size))
+
+    if args.json != None:
+        with open(args.json, "w") as file:
+            file.write(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import cadquery as cq
+
+# An assembly of many coloured parts, like a board full of components
+rows = 10
+columns = 10
+spacing = 12.0
+
+board = cq.Workplane().box(rows * spacing, columns * spacing, 1.6)
+component = cq.Workplane().box(8, 8, 4).edges("|Z").fillet(1.0).faces(">Z").hole(2.0)
+
+assy = cq.Assembly()
+assy.add(board, name="board", color=cq.Color("green"))
+for row in range(rows):
+    for column in range(columns):
+        x = (row - (rows - 1) / 2) * spacing
+        y = (column - (columns - 1) / 2) * spacing
+        assy.add(
+            component,
+            name="part_%d_%d" % (row, column),
+            loc=cq.Location((x, y, 2.8)),
+            color=cq.Color("gray"),
+        )
+
+show_object(assy)
@@ -0,0 +1,21 @@
+import cadquery as cq
+
+# A heat sink with many pinned fins on a filleted base, which has a lot of faces to mesh
+fins = 40
+pins = 12
+fin_height = 30.0
+pitch = 4.0
+pin_diameter = 2.0
+
+depth = pins * pitch
+base = cq.Workplane().box(fins * pitch, depth, 5.0).edges("|Y").fillet(1.0)
+pin_array = (
+    cq.Workplane()
+    .workplane(offset=2.5)
+    .rarray(pitch, pitch, fins, pins)
+    .circle(pin_diameter / 2)
+    .extrude(fin_height)
+)
+heat_sink = base.union(pin_array)
+
+show_object(heat_sink)
@@ -0,0 +1,18 @@
+import cadquery as cq
+
+# A plate with a grid of counterbored holes
+holes = 8
+spacing = 10.0
+thickness = 5.0
+
+size = holes * spacing
+plate = (
+    cq.Workplane()
+    .box(size, size, thickness)
+    .faces(">Z")
+    .workplane()
+    .rarray(spacing, spacing, holes, holes)
+    .cboreHole(3.0, 6.0, 2.0)
+)
+
+show_object(plate)
@@ -0,0 +1,11 @@
+import cadquery as cq
+
+# A filleted block, roughly the size of a typical single part
+length = 40.0
+width = 20.0
+height = 10.0
+fillet = 2.0
+
+part = cq.Workplane().box(length, width, height).edges("|Z").fillet(fillet)
+
+show_object(part)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Benchmarks cq-cli end to end on a set of models of different sizes.
+
+Every model is converted with every codec in a fresh cq-cli process, the same way users and
+pipelines run it. The wall time of the whole process (which includes interpreter and CadQuery
+start-up) is measured from the outside, and the time of each phase (reading the script, parse,
+build, export and write) comes from the --metrics-file report. Start-up is also measured on its
+own. The results are written as JSON and can be compared with an earlier run to catch regressions.
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --compare results.json --threshold 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN = os.path.join(BENCHMARK_DIR, "..", "src", "cq_cli", "main.py")
+MODELS_DIR = os.path.join(BENCHMARK_DIR, "models")
+
+DEFAULT_MODELS = ["small", "medium", "large", "assembly"]
+DEFAULT_CODECS = ["step", "stl", "glb", "threejs", "svg"]
+
+# File extensions that the codecs are detected from
+EXTENSIONS = {"threejs": "json"}
+
+# Differences smaller than this are treated as noise when comparing runs
+NOISE_SECONDS = 0.05
+
+
+def run_timed(command):
+    """
+    Runs a command and returns its wall time in seconds, raising if it fails.
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    elapsed = time.perf_counter() - start
+
+    if proc.returncode != 0:
+        raise RuntimeError(
+            "%s exited with %d:\n%s"
+            % (" ".join(command), proc.returncode, proc.stderr.decode())
+        )
+
+    return elapsed
+
+
+def phase_kind(name):
+    """
+    Works out the kind of a phase from its name, dropping the output file name it may carry.
+    """
+    # Phases such as "write stl (out.stl)" name their output, keep only the kind
+    if name.startswith("read script"):
+        return "read_script"
+    return name.split(" ")[0]
+
+
+def summarize_phases(report):
+    """
+    Adds up the phases in a metrics report by kind, dropping the output file names so
+    that phases can be compared between runs. Nested phases are kept apart from their
+    parents, whose time already includes them.
+    """
+    names = set(entry["phase"] for entry in report["phases"])
+
+    def summary_name(phase):
+        # Nested phases are named after their parent, which is reported as a phase of its own
+        parents = [name for name in names if phase.startswith(name + "/")]
+        if len(parents) == 0:
+            return phase_kind(phase)
+        parent = max(parents, key=len)
+        return summary_name(parent) + "/" + phase_kind(phase[len(parent) + 1 :])
+
+    phases = {}
+    for entry in report["phases"]:
+        name = summary_name(entry["phase"])
+        phases[name] = phases.get(name, 0.0) + entry["wall_seconds"]
+    return phases
+
+
+def measure_startup(repeat):
+    """
+    Measures how long it takes to start Python, cq-cli and CadQuery without doing any work.
+    """
+    small = os.path.join(MODELS_DIR, "small.py")
+    commands = {
+        "python": [sys.executable, "-c", "pass"],
+        "cq_cli": [sys.executable, MAIN, "--validate", "syntax", "--infile", small],
+        "import_cadquery": [sys.executable, "-c", "import cadquery"],
+    }
+
+    return {
+        name: statistics.median(run_timed(command) for _ in range(repeat))
+        for name, command in commands.items()
+    }
+
+
+def measure_conversion(model, codec, repeat, temp_dir):
+    """
+    Converts a model with a codec several times and returns the median timings and output size.
+    """
+    outfile = os.path.join(temp_dir, "%s.%s" % (model, EXTENSIONS.get(codec, codec)))
+    metrics_file = os.path.join(temp_dir, "metrics.json")
+    command = [
+        sys.executable,
+        MAIN,
+        "--codec",
+        codec,
+        "--infile",
+        os.path.join(MODELS_DIR, model + ".py"),
+        "--outfile",
+        outfile,
+        "--metrics-file",
+        metrics_file,
+    ]
+
+    walls = []
+    phase_runs = []
+    peak_rss = []
+    for _ in range(repeat):
+        walls.append(run_timed(command))
+        with open(metrics_file, "r") as file:
+            report = json.load(file)
+        phase_runs.append(summarize_phases(report))
+        peak_rss.append(report["total"]["peak_rss_mb"])
+
+    phase_names = sorted(set(name for run in phase_runs for name in run))
+    return {
+        "model": model,
+        "codec": codec,
+        "runs": repeat,
+        "wall_seconds": statistics.median(walls),
+        "phases": {
+            name: statistics.median(run.get(name, 0.0) for run in phase_runs)
+            for name in phase_names
+        },
+        "peak_rss_mb": None if None in peak_rss else statistics.median(peak_rss),
+        "output_bytes": os.path.getsize(outfile),
+    }
+
+
+def environment():
+    """
+    Describes what the benchmarks ran on, so that results from different machines are not mixed up.
+    """
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+    proc = subprocess.run(
+        [sys.executable, "-c", "import cadquery; print(cadquery.__version__)"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    info["cadquery"] = proc.stdout.decode().strip() or None
+
+    return info
+
+
+def compare(results, baseline, threshold):
+    """
+    Lists the timings that got slower than the baseline by more than the threshold.
+    """
+    baseline_results = {
+        (r["model"], r["codec"]): r for r in baseline.get("results", [])
+    }
+
+    regressions = []
+    for result in results["results"]:
+        old = baseline_results.get((result["model"], result["codec"]))
+        if old == None:
+            continue
+
+        timings = [("wall_seconds", result["wall_seconds"], old["wall_seconds"])]
+        for name, seconds in result["phases"].items():
+            if name in old["phases"]:
+                timings.append(("phases." + name, seconds, old["phases"][name]))
+
+        for name, new_seconds, old_seconds in timings:
+            if (
+                new_seconds > old_seconds * (1 + threshold)
+                and new_seconds - old_seconds > NOISE_SECONDS
+            ):
+                regressions.append(
+                    "%s/%s %s: %.3fs -> %.3fs"
+                    % (
+                        result["model"],
+                        result["codec"],
+                        name,
+                        old_seconds,
+                        new_seconds,
+                    )
+                )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--models",
+        default=",".join(DEFAULT_MODELS),
+        help="Comma separated models from benchmarks/models to run.",
+    )
+    parser.add_argument(
+        "--codecs",
+        default=",".join(DEFAULT_CODECS),
+        help="Comma separated codecs to export each model with.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per measurement (median is kept)."
+    )
+    parser.add_argument("--output", help="File to write the JSON results to.")
+    parser.add_argument(
+        "--compare", help="Earlier JSON results to check for regressions against."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Slowdown, as a fraction, that counts as a regression. Defaults to 0.2.",
+    )
+    args = parser.parse_args()
+
+    results = {
+        "environment": environment(),
+        "startup": measure_startup(args.repeat),
+        "results": [],
+    }
+
+    print("start-up: " + json.dumps(results["startup"]), file=sys.stderr)
+    with tempfile.TemporaryDirectory(prefix="cq-cli-bench-") as temp_dir:
+        for model in args.models.split(","):
+            for codec in args.codecs.split(","):
+                result = measure_conversion(model, codec, args.repeat, temp_dir)
+                results["results"].append(result)
+                print(
+                    "%-10s %-8s %8.3fs %12d bytes"
+                    % (model, codec, result["wall_seconds"], result["output_bytes"]),
+                    file=sys.stderr,
+                )
+
+    if args.output != None:
+        with open(args.output, "w") as file:
+            file.write(json.dumps(results, indent=2))
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare != None:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)
+
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print("Regression: " + regression, file=sys.stderr)
+        if len(regressions) > 0:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+A binary STL writer that pulls the triangulations into NumPy arrays, which bench_stl.py
+compares against OCCT's StlAPI_Writer. The STL codec uses StlAPI_Writer, which came out
+much faster, so this is only kept for the benchmark.
+"""
+
+import struct
+from itertools import chain
+from OCP.BRep import BRep_Tool
+from OCP.TopAbs import TopAbs_FACE, TopAbs_REVERSED
+from OCP.TopExp import TopExp_Explorer
+from OCP.TopLoc import TopLoc_Location
+from OCP.TopoDS import TopoDS
+
+# NumPy is not a dependency of cq-cli
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Binary STL headers must not start with "solid", or readers may take them for ASCII
+HEADER = b"Binary STL written by cq-cli".ljust(80, b" ")
+
+if np != None:
+    # The 50 byte record of each triangle in a binary STL file
+    TRIANGLE_DTYPE = np.dtype(
+        [
+            ("normal", "<f4", (3,)),
+            ("vertices", "<f4", (3, 3)),
+            ("attribute", "<u2"),
+        ]
+    )
+
+
+def available():
+    """
+    Checks whether the NumPy writer can be used.
+    """
+    return np != None
+
+
+def triangulation_arrays(shape):
+    """
+    Collects the triangulations stored on the faces of a meshed shape into arrays of
+    vertex positions (N x 3) and triangle vertex indices (M x 3), in global coordinates
+    and with the triangles of reversed faces wound the other way.
+    """
+    vertex_arrays = []
+    triangle_arrays = []
+    offset = 0
+
+    explorer = TopExp_Explorer(shape.wrapped, TopAbs_FACE)
+    while explorer.More():
+        face = TopoDS.Face_s(explorer.Current())
+        explorer.Next()
+
+        location = TopLoc_Location()
+        poly = BRep_Tool.Triangulation_s(face, location)
+        if poly == None:
+            continue
+
+        # OCP has no buffer access to triangulations, so each node and triangle is read with
+        # one call straight into a flat array, without building Python tuples in between
+        node_count = poly.NbNodes()
+        nodes = np.fromiter(
+            chain.from_iterable(poly.Node(i).Coord() for i in range(1, node_count + 1)),
+            dtype=np.float64,
+            count=3 * node_count,
+        ).reshape(-1, 3)
+
+        triangle_count = poly.NbTriangles()
+        triangles = np.fromiter(
+            chain.from_iterable(
+                poly.Triangle(i).Get() for i in range(1, triangle_count + 1)
+            ),
+            dtype=np.int64,
+            count=3 * triangle_count,
+        ).reshape(-1, 3)
+
+        # Each face can sit at its own location, which is applied to all of its nodes at once
+        if not location.IsIdentity():
+            trsf = location.Transformation()
+            matrix = np.array(
+                [[trsf.Value(row, col) for col in range(1, 5)] for row in range(1, 4)]
+            )
+            nodes = nodes @ matrix[:, :3].T + matrix[:, 3]
+
+        if face.Orientation() == TopAbs_REVERSED:
+            triangles = triangles[:, [0, 2, 1]]
+
+        # OCCT indexes nodes from 1
+        vertex_arrays.append(nodes)
+        triangle_arrays.append(triangles + (offset - 1))
+        offset += node_count
+
+    if len(triangle_arrays) == 0:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+
+    return np.concatenate(vertex_arrays), np.concatenate(triangle_arrays)
+
+
+def binary_stl(vertices, triangles):
+    """
+    Builds the contents of a binary STL file from vertex and triangle arrays, computing
+    the facet normals for all triangles at once.
+    """
+    corners = vertices[triangles]
+
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, lengths, out=normals, where=lengths > 0)
+
+    records = np.zeros(len(triangles), dtype=TRIANGLE_DTYPE)
+    records["normal"] = normals
+    records["vertices"] = corners
+
+    return HEADER + struct.pack("<I", len(triangles)) + records.tobytes()
+
+
+def write_binary_stl(shape, output_file=None):
+    """
+    Writes a meshed shape as binary STL to a file, or returns the STL data if there is no file.
+    """
+    stl_data = binary_stl(*triangulation_arrays(shape))
+
+    if output_file == None:
+        return stl_data
+
+    with open(output_file, "wb") as file:
+        file.write(stl_data)
+    return None
@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import sysconfig
+
+# Default upper bound on the size of the build cache, in megabytes
+DEFAULT_CACHE_SIZE = 1024
+
+MANIFEST_NAME = "manifest.json"
+
+
+def hash_file(file_path):
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _library_dirs():
+    """
+    Directories holding the standard library and installed packages, which are not user modules.
+    """
+    paths = sysconfig.get_paths()
+    dirs = [os.path.dirname(os.path.abspath(__file__))]
+    for name in ("stdlib", "platstdlib", "purelib", "platlib"):
+        if name in paths:
+            dirs.append(os.path.abspath(paths[name]))
+    return dirs
+
+
+def local_module_files(modules_before):
+    """
+    Finds the source files of user modules that were imported since the sys.modules snapshot was taken.
+    """
+    library_dirs = [os.path.join(d, "") for d in _library_dirs()]
+
+    files = []
+    for name in list(sys.modules):
+        if name in modules_before:
+            continue
+
+        module_file = getattr(sys.modules[name], "__file__", None)
+        if module_file == None or not os.path.isfile(module_file):
+            continue
+
+        module_file = os.path.abspath(module_file)
+        if not any(module_file.startswith(d) for d in library_dirs):
+            files.append(module_file)
+
+    return sorted(files)
+
+
+def _dir_size(dir_path):
+    total = 0
+    for root, dirs, files in os.walk(dir_path):
+        for file_name in files:
+            total += os.path.getsize(os.path.join(root, file_name))
+    return total
+
+
+class BuildCache:
+    """
+    Content-addressed on-disk cache of CQGI build results, stored as BREP files.
+    Entries are keyed on everything that can change the build output and are evicted
+    least-recently-used first once the cache grows past its size limit.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_SIZE):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_size * 1024 * 1024
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, script_str, params, expression=None):
+        """
+        Hashes the script text, parameters, expression and CadQuery version into a cache key.
+        """
+        import cadquery
+
+        key_data = json.dumps(
+            {
+                "script": script_str,
+                "params": params,
+                "expression": expression,
+                "cadquery": cadquery.__version__,
+            },
+            sort_keys=True,
+            default=str,
+        )
+
+        return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _dependencies_match(self, dependencies):
+        """
+        Checks that none of the user modules the script imported have changed.
+        """
+        for dep in dependencies:
+            if not os.path.isfile(dep["path"]):
+                return False
+
+            # Unchanged size and mtime is good enough, otherwise fall back to the contents
+            stat = os.stat(dep["path"])
+            if stat.st_size == dep["size"] and stat.st_mtime_ns == dep["mtime"]:
+                continue
+            if hash_file(dep["path"]) != dep["sha256"]:
+                return False
+
+        return True
+
+    def load(self, key):
+        """
+        Rebuilds a CQGI build result from the cache, or returns None on a cache miss.
+        """
+        import cadquery as cq
+        from cadquery import cqgi
+
+        entry_dir = self._entry_dir(key)
+        manifest_path = os.path.join(entry_dir, MANIFEST_NAME)
+        if not os.path.isfile(manifest_path):
+            return None
+
+        try:
+            with open(manifest_path, "r") as file:
+                manifest = json.load(file)
+
+            if not self._dependencies_match(manifest["dependencies"]):
+                return None
+
+            results = []
+            for entry in manifest["results"]:
+                shapes = [
+                    cq.Shape.importBrep(os.path.join(entry_dir, brep))
+                    for brep in entry["breps"]
+                ]
+
+                shape_result = cqgi.ShapeResult()
+                if entry["kind"] == "workplane":
+                    shape_result.shape = cq.Workplane("XY").newObject(shapes)
+                else:
+                    shape_result.shape = shapes[0]
+                shape_result.options = entry["options"]
+                results.append(shape_result)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # Mark the entry as recently used for LRU eviction
+        os.utime(manifest_path)
+
+        build_result = cqgi.BuildResult()
+        build_result.set_success_result(results)
+
+        return build_result
+
+    def store(self, key, build_result, modules_before):
+        """
+        Saves a successful build result to the cache. Results that cannot be represented
+        as plain BREP shapes (such as assemblies) are not cached.
+        """
+        import cadquery as cq
+
+        manifest = {"results": [], "dependencies": []}
+
+        # Make sure everything can be cached before writing anything
+        for result in build_result.results:
+            if isinstance(result.shape, cq.Workplane):
+                kind = "workplane"
+                shapes = result.shape.vals()
+            elif isinstance(result.shape, cq.Shape):
+                kind = "shape"
+                shapes = [result.shape]
+            else:
+                return
+
+            if not all(isinstance(s, cq.Shape) for s in shapes):
+                return
+
+            try:
+                json.dumps(result.options)
+            except (TypeError, ValueError):
+                return
+
+            manifest["results"].append(
+                {"kind": kind, "options": result.options, "shapes": shapes}
+            )
+
+        for module_file in local_module_files(modules_before):
+            stat = os.stat(module_file)
+            manifest["dependencies"].append(
+                {
+                    "path": module_file,
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                    "sha256": hash_file(module_file),
+                }
+            )
+
+        # Write into a scratch directory first so that readers never see a partial entry
+        entry_dir = self._entry_dir(key)
+        scratch_dir = entry_dir + ".%d.tmp" % os.getpid()
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        os.makedirs(scratch_dir)
+
+        try:
+            for i, entry in enumerate(manifest["results"]):
+                entry["breps"] = []
+                for j, shape in enumerate(entry.pop("shapes")):
+                    brep_name = "result_%d_%d.brep" % (i, j)
+                    shape.exportBrep(os.path.join(scratch_dir, brep_name))
+                    entry["breps"].append(brep_name)
+
+            with open(os.path.join(scratch_dir, MANIFEST_NAME), "w") as file:
+                json.dump(manifest, file)
+
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.rename(scratch_dir, entry_dir)
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in its size limit.
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            manifest_path = os.path.join(entry_dir, MANIFEST_NAME)
+            if not os.path.isfile(manifest_path):
+                continue
+
+            size = _dir_size(entry_dir)
+            entries.append((os.path.getmtime(manifest_path), size, entry_dir))
+            total += size
+
+        for mtime, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
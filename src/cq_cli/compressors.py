@@ -0,0 +1,258 @@
+import os
+import sys
+import gzip
+import lzma
+import time
+import shutil
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from functools import partial
+
+# The output file suffixes that turn compression on by themselves
+SUFFIXES = {".gz": "gzip", ".zst": "zstd", ".xz": "xz"}
+
+# How much of the output is handed to the compressor at a time
+CHUNK_SIZE = 1024 * 1024
+
+
+def detect(outfile):
+    """
+    Returns the compression method implied by an output file's suffix, or None.
+    """
+    if outfile == None:
+        return None
+
+    for suffix, method in SUFFIXES.items():
+        if outfile.lower().endswith(suffix):
+            return method
+    return None
+
+
+def strip_suffix(outfile):
+    """
+    Removes a compression suffix from an output file name, so that the codec can be
+    detected from the extension underneath it (model.step.gz -> model.step).
+    """
+    if detect(outfile) == None:
+        return outfile
+    return outfile.rsplit(".", 1)[0]
+
+
+def _zstd_module():
+    """
+    Returns the zstd module to use: the standard library one on Python 3.14+, otherwise
+    the zstandard package.
+    """
+    try:
+        from compression import zstd
+
+        return zstd
+    except ImportError:
+        pass
+
+    try:
+        import zstandard
+
+        return zstandard
+    except ImportError:
+        raise ValueError(
+            "zstd compression needs Python 3.14 or the zstandard package to be installed"
+        )
+
+
+def check_available(method):
+    """
+    Raises ValueError if a compression method cannot be used in this environment.
+    """
+    if method not in SUFFIXES.values():
+        raise ValueError("Unknown compression method: " + str(method))
+
+    if method == "zstd":
+        _zstd_module()
+
+
+def compressor(fileobj, method):
+    """
+    Wraps a binary file in a writer that compresses everything written to it.
+    Closing the writer finishes the compressed stream but leaves the file open.
+    """
+    if method == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="wb")
+    elif method == "xz":
+        return lzma.LZMAFile(fileobj, "wb")
+    elif method == "zstd":
+        zstd = _zstd_module()
+        if hasattr(zstd, "ZstdFile"):
+            return zstd.ZstdFile(fileobj, "wb")
+        return zstd.ZstdCompressor().stream_writer(fileobj, closefd=False)
+
+    raise ValueError("Unknown compression method: " + str(method))
+
+
+def _write_chunks(chunks, outfile, method):
+    """
+    Streams chunks of bytes through a compressor into the output file, or to stdout if there is no file.
+    """
+    if outfile == None:
+        target = sys.stdout.buffer
+    else:
+        target = open(outfile, "wb")
+
+    try:
+        writer = compressor(target, method)
+        with writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    finally:
+        if outfile == None:
+            target.flush()
+        else:
+            target.close()
+
+
+def write_compressed(converted, outfile, method):
+    """
+    Streams codec output through a compressor into the output file, or to stdout if there is no file.
+    """
+    if isinstance(converted, str):
+        converted = converted.encode("utf-8")
+
+    view = memoryview(converted)
+    chunks = (
+        view[start : start + CHUNK_SIZE] for start in range(0, len(view), CHUNK_SIZE)
+    )
+    _write_chunks(chunks, outfile, method)
+
+
+def compress_file(source_file, outfile, method):
+    """
+    Streams a file that a codec exported through a compressor into the output file, or to
+    stdout if there is no file, without reading all of it into memory.
+    """
+    with open(source_file, "rb") as file:
+        _write_chunks(iter(partial(file.read, CHUNK_SIZE), b""), outfile, method)
+
+
+def streams_output(codec_module):
+    """
+    Checks whether a codec writes its output front to back, so that it can be compressed as
+    it is written. Codecs say so with a STREAMS_OUTPUT flag.
+    """
+    return getattr(codec_module, "STREAMS_OUTPUT", False)
+
+
+class CompressedOutput:
+    """
+    Somewhere for a codec to export output that is to be compressed into an output file. For
+    codecs that write their output front to back, this is a named pipe that a separate process
+    reads and compresses while the codec is still writing. The exporters hold the GIL while
+    they write, so a thread in this process could not keep up. Otherwise, or where named pipes
+    are not available, it is a temp file that is compressed once the codec is done. Either way
+    it is named like the output file without its compression suffix, in a private temp directory.
+    """
+
+    def __init__(self, outfile, method, stream):
+        self.outfile = outfile
+        self.method = method
+        self.temp_dir = tempfile.mkdtemp(prefix="cq-cli-")
+        name = os.path.basename(strip_suffix(outfile)) if outfile != None else "output"
+        self.path = os.path.join(self.temp_dir, name)
+
+        # Output to stdout is staged, since the process cannot write to a captured stdout
+        self.process = None
+        self.streamed = (
+            stream
+            and outfile != None
+            and hasattr(os, "mkfifo")
+            and not getattr(sys, "frozen", False)
+        )
+        if self.streamed:
+            os.mkfifo(self.path, 0o600)
+            self.process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), self.path, outfile, method],
+                stderr=subprocess.PIPE,
+            )
+
+    def _stop(self):
+        """
+        Stops the compressing process, for when the codec will not be writing to the pipe.
+        """
+        self.process.kill()
+        self.process.communicate()
+        self.process = None
+
+    def _wait(self):
+        """
+        Waits for the compressing process to finish. The pipe is opened first in case the codec
+        never did, since the process cannot finish until something has.
+        """
+        while self.process.poll() == None:
+            try:
+                os.close(os.open(self.path, os.O_WRONLY | os.O_NONBLOCK))
+                break
+            except OSError:
+                # Nothing is reading yet, or any more
+                time.sleep(0.01)
+
+        _, err = self.process.communicate()
+        exit_code = self.process.returncode
+        self.process = None
+        if exit_code != 0:
+            raise OSError(
+                "Compressing the output failed: " + err.decode("utf-8", "replace")
+            )
+
+    def finish(self, converted):
+        """
+        Compresses what the codec exported, or what it returned if it kept its output in
+        memory, into the output file. Any other files the codec wrote next to its output,
+        such as the buffers of a glTF file, are moved next to the output file uncompressed.
+        """
+        if converted != None:
+            # A codec that keeps its output in memory never opens the pipe
+            if self.process != None:
+                self._stop()
+            write_compressed(converted, self.outfile, self.method)
+        elif self.streamed:
+            self._wait()
+        else:
+            compress_file(self.path, self.outfile, self.method)
+
+        if self.outfile != None:
+            out_dir = os.path.dirname(os.path.abspath(self.outfile))
+            for name in os.listdir(self.temp_dir):
+                if os.path.join(self.temp_dir, name) != self.path:
+                    shutil.move(
+                        os.path.join(self.temp_dir, name), os.path.join(out_dir, name)
+                    )
+
+    def close(self):
+        if self.process != None:
+            self._stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+@contextmanager
+def compressed_output(outfile, method, stream=False):
+    """
+    Yields a CompressedOutput for the output file, removing its temp directory afterwards.
+    """
+    output = CompressedOutput(outfile, method, stream)
+    try:
+        yield output
+    finally:
+        output.close()
+
+
+def _compress_pipe(pipe, outfile, method):
+    """
+    Compresses what is written to a named pipe into the output file, until the writer closes it.
+    """
+    with open(pipe, "rb") as source:
+        _write_chunks(iter(partial(source.read, CHUNK_SIZE), b""), outfile, method)
+
+
+# Run by CompressedOutput, with the pipe, the output file and the compression method
+if __name__ == "__main__":
+    _compress_pipe(*sys.argv[1:4])
@@ -1,10 +1,234 @@
-from contextlib import contextmanager, redirect_stderr, redirect_stdout
-from os import devnull
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from os import devnull, path
+from cq_cli import profiling
+
+# Conversions can run in threads, so only the outermost suppression swaps the streams
+_suppress_lock = threading.Lock()
+_suppress_depth = 0
+_saved_streams = None
 
 
 @contextmanager
 def suppress_stdout_stderr():
     """A context manager that redirects stdout and stderr to devnull"""
-    with open(devnull, "w") as fnull:
-        with redirect_stderr(fnull) as err, redirect_stdout(fnull) as out:
-            yield (err, out)
+    global _suppress_depth, _saved_streams
+
+    with _suppress_lock:
+        if _suppress_depth == 0:
+            fnull = open(devnull, "w")
+            _saved_streams = (sys.stdout, sys.stderr, fnull)
+            sys.stdout = sys.stderr = fnull
+        _suppress_depth += 1
+        fnull = _saved_streams[2]
+
+    try:
+        yield (fnull, fnull)
+    finally:
+        with _suppress_lock:
+            _suppress_depth -= 1
+            if _suppress_depth == 0:
+                sys.stdout, sys.stderr, fnull = _saved_streams
+                _saved_streams = None
+                fnull.close()
+
+
+@contextmanager
+def export_path(output_file, temp_name):
+    """
+    A context manager that yields the path a codec should export to. This is the output file
+    itself when there is one, otherwise a file in a private temporary directory that is
+    removed afterwards, so that concurrent runs never share temp files.
+    """
+    if output_file != None:
+        yield output_file
+        return
+
+    with tempfile.TemporaryDirectory(
+        prefix="cq-cli-", ignore_cleanup_errors=True
+    ) as temp_dir:
+        yield path.join(temp_dir, temp_name)
+
+
+def read_output(temp_file, mode="r"):
+    """
+    Reads an exported temp file back in so that it can be sent to stdout.
+    """
+    with profiling.phase("readback"):
+        with open(temp_file, mode) as file:
+            return file.read()
+
+
+def result_name(shape_result, index):
+    """
+    Returns the name given to a show_object() result, or a name based on its index if it has none.
+    """
+    options = shape_result.options or {}
+    name = options.get("name")
+    if name == None or str(name) == "":
+        return "result" + str(index)
+    return str(name)
+
+
+def split_results(build_result):
+    """
+    Splits a build result into one build result per show_object() result, so that each
+    object can be handed to a codec on its own.
+    """
+    from cadquery import cqgi
+
+    split = []
+    for shape_result in build_result.results:
+        object_result = cqgi.BuildResult()
+        object_result.set_success_result([shape_result])
+        split.append(object_result)
+    return split
+
+
+def _to_color(color, alpha=None):
+    """
+    Converts a show_object() color option, either a color name or an RGB(A) tuple with
+    components from 0 to 1 or 0 to 255, into a CadQuery Color.
+    """
+    import cadquery as cq
+
+    if isinstance(color, str):
+        rgba = cq.Color(color).toTuple()
+    else:
+        rgba = tuple(color)
+        if any(c > 1 for c in rgba[:3]):
+            rgba = tuple(c / 255.0 for c in rgba[:3]) + rgba[3:]
+        if len(rgba) == 3:
+            rgba = rgba + (1.0,)
+
+    # Like CQ-editor, alpha is the transparency of the object
+    if alpha != None:
+        rgba = rgba[:3] + (1.0 - alpha,)
+
+    return cq.Color(*rgba)
+
+
+def results_to_assembly(build_result):
+    """
+    Combines every show_object() result into a single assembly, keeping their names and colors,
+    and returns a build result holding just that assembly.
+    """
+    import cadquery as cq
+    from cadquery import cqgi
+
+    assy = cq.Assembly()
+    used_names = set()
+    for index, shape_result in enumerate(build_result.results):
+        options = shape_result.options or {}
+
+        # Assembly children need unique names
+        name = result_name(shape_result, index)
+        if name in used_names:
+            name = name + "_" + str(index)
+        used_names.add(name)
+
+        color = None
+        if options.get("color") != None:
+            color = _to_color(options["color"], options.get("alpha"))
+
+        assy.add(shape_result.shape, name=name, color=color)
+
+    assembly_result = cqgi.ShapeResult()
+    assembly_result.shape = assy
+    assembly_result.options = {}
+
+    combined = cqgi.BuildResult()
+    combined.set_success_result([assembly_result])
+    return combined
+
+
+def mesh_deflections(output_opts):
+    """
+    Returns the linear and angular deflection that the mesh codecs should use, from the output
+    options if they were given.
+    """
+    linearDeflection = 0.1
+    angularDeflection = 0.1
+
+    # If the user has provided the deflection settings, use them
+    if output_opts and "linearDeflection" in output_opts:
+        linearDeflection = output_opts["linearDeflection"]
+    if output_opts and "angularDeflection" in output_opts:
+        angularDeflection = output_opts["angularDeflection"]
+
+    return linearDeflection, angularDeflection
+
+
+def lod_outputs(output_file, output_opts):
+    """
+    Works out the levels of detail that a mesh codec has been asked for with the lods output option,
+    a list of linear deflections such as lods:(0.05,0.2,1.0). The angular deflections can be given
+    with lodAngularDeflections, otherwise the finest level uses angularDeflection and the coarser
+    levels scale it up by as much as their linear deflection, since curved faces are usually
+    limited by the angular deflection and would otherwise mesh the same at every level.
+    Returns a list of (output file, output options) with one entry per level, from finest to coarsest,
+    or None if no levels of detail were asked for.
+    """
+    if not output_opts or "lods" not in output_opts:
+        return None
+
+    if output_file == None:
+        raise ValueError(
+            "Levels of detail are written to separate files, so an outfile is required"
+        )
+
+    linear = output_opts["lods"]
+    if not isinstance(linear, (list, tuple)):
+        linear = [linear]
+
+    angular = output_opts.get("lodAngularDeflections")
+    if angular == None:
+        finest = min(linear)
+        angularDeflection = mesh_deflections(output_opts)[1]
+        angular = [angularDeflection * level / finest for level in linear]
+    elif not isinstance(angular, (list, tuple)):
+        angular = [angular] * len(linear)
+
+    if len(angular) != len(linear):
+        raise ValueError("lodAngularDeflections needs one value per level of detail")
+
+    # Mesh from the finest level to the coarsest
+    levels = sorted(zip(linear, angular))
+
+    base, extension = path.splitext(output_file)
+    outputs = []
+    for index, (linearDeflection, angularDeflection) in enumerate(levels):
+        lod_opts = {
+            k: v
+            for k, v in output_opts.items()
+            if k not in ("lods", "lodAngularDeflections")
+        }
+        lod_opts["linearDeflection"] = linearDeflection
+        lod_opts["angularDeflection"] = angularDeflection
+
+        outputs.append((base + ".lod" + str(index) + extension, lod_opts))
+
+    return outputs
+
+
+def as_assembly(build_result):
+    """
+    Returns the build result as is if its first result is an assembly, otherwise a build result
+    holding every show_object() result combined into an assembly. The combined result is kept
+    on the build result so that codecs converting the same build share it and its meshes.
+    """
+    if type(build_result.first_result.shape).__name__ == "Assembly":
+        return build_result
+
+    from cq_cli.cqcodecs import tessellation
+
+    combined = getattr(build_result, "assembly_result", None)
+    if combined == None:
+        combined = results_to_assembly(build_result)
+
+        # The combined result holds the same shapes, so it meshes through the same cache
+        combined.tessellation_cache = tessellation.get_cache(build_result)
+        build_result.assembly_result = combined
+    return combined
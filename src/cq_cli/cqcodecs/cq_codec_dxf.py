@@ -1,25 +1,28 @@
-import os, tempfile
 from cadquery import exporters
 import cq_cli.cqcodecs.codec_helpers as helpers
 
+# ezdxf writes the DXF sections in order
+STREAMS_OUTPUT = True
+
 
 def convert(build_result, output_file=None, error_file=None, output_opts=None):
-    # Create a temporary file to put the STL output into
-    temp_dir = tempfile.gettempdir()
-    temp_file = os.path.join(temp_dir, "temp_dxf.dxf")
+    # Export into a private temp file, unless the output can go straight to the output file
+    with helpers.export_path(output_file, "temp_dxf.dxf") as temp_file:
+        # The exporters will add extra output that we do not want, so suppress it
+        with helpers.suppress_stdout_stderr():
+            # Put the DXF output into the temp file
+            exporters.export(
+                build_result.results[0].shape,
+                temp_file,
+                exporters.ExportTypes.DXF,
+                opt=output_opts,
+            )
 
-    # The exporters will add extra output that we do not want, so suppress it
-    with helpers.suppress_stdout_stderr():
-        # Put the DXF output into the temp file
-        exporters.export(
-            build_result.results[0].shape,
-            temp_file,
-            exporters.ExportTypes.DXF,
-            opt=output_opts,
-        )
+        # The output has already been written where it needs to go
+        if output_file != None:
+            return None
 
-    # Read the DXF output back in
-    with open(temp_file, "r") as file:
-        dxf_str = file.read()
+        # Read the DXF output back in
+        dxf_str = helpers.read_output(temp_file)
 
     return dxf_str
@@ -1,25 +1,51 @@
-import os, tempfile
+from cadquery.occ_impl.exporters.assembly import exportGLTF
 import cq_cli.cqcodecs.codec_helpers as helpers
+from cq_cli.cqcodecs import tessellation
+
+# OCCT goes back to fill in the GLB header once the rest is written, which a pipe cannot do
+STREAMS_OUTPUT = False
 
 
 def convert(build_result, output_file=None, error_file=None, output_opts=None):
-    # Create a temporary file to put the STL output into
-    temp_dir = tempfile.gettempdir()
-    temp_file = os.path.join(temp_dir, "temp_glb.glb")
-
-    # The exporters will add extra output that we do not want, so suppress it
-    with helpers.suppress_stdout_stderr():
-        # Put the GLB output into the temp file
-        # Check to see if we are dealing with an assembly or a single object
-        if type(build_result.first_result.shape).__name__ == "Assembly":
-            build_result.first_result.shape.save(temp_file, binary=True)
-        else:
-            raise ValueError(
-                "GLB export is only available for CadQuery assemblies at this time"
+    # glTF is written from assemblies, so other results are combined into one
+    build_result = helpers.as_assembly(build_result)
+
+    # Write each level of detail to its own file, reusing the built shapes
+    lods = helpers.lod_outputs(output_file, output_opts)
+    if lods != None:
+        for lod_file, lod_opts in lods:
+            convert(build_result, lod_file, error_file, lod_opts)
+        return None
+
+    # If the user has provided the deflection settings, use them
+    linearDeflection, angularDeflection = helpers.mesh_deflections(output_opts)
+
+    # Export into a private temp file, unless the output can go straight to the output file
+    with helpers.export_path(output_file, "temp_glb.glb") as temp_file:
+        # The exporters will add extra output that we do not want, so suppress it
+        with helpers.suppress_stdout_stderr():
+            # Mesh through the shared cache first. The glTF writer only meshes faces that
+            # have no triangulation as fine as it needs, so it reuses this one.
+            tessellation.get_cache(build_result).mesh(
+                tessellation.mesh_shape(build_result),
+                linearDeflection,
+                angularDeflection,
             )
 
-    # Read the GLB output back in
-    with open(temp_file, "rb") as file:
-        glb_data = file.read()
+            # Export directly so that the output is binary regardless of the file extension
+            exportGLTF(
+                build_result.first_result.shape,
+                temp_file,
+                binary=True,
+                tolerance=linearDeflection,
+                angularTolerance=angularDeflection,
+            )
+
+        # The output has already been written where it needs to go
+        if output_file != None:
+            return None
+
+        # Read the GLB output back in
+        glb_data = helpers.read_output(temp_file, "rb")
 
     return glb_data
@@ -1,29 +1,32 @@
-import os, tempfile
 from cadquery import exporters
 import cadquery as cq
 import cq_cli.cqcodecs.codec_helpers as helpers
 
+# STEP files are written front to back, so they can be compressed as they are written
+STREAMS_OUTPUT = True
+
 
 def convert(build_result, output_file=None, error_file=None, output_opts=None):
-    # Create a temporary file to put the STL output into
-    temp_dir = tempfile.gettempdir()
-    temp_file = os.path.join(temp_dir, "temp_step.step")
+    # Export into a private temp file, unless the output can go straight to the output file
+    with helpers.export_path(output_file, "temp_step.step") as temp_file:
+        # The exporters will add extra output that we do not want, so suppress it
+        with helpers.suppress_stdout_stderr():
+            # There should be a shape in the build results
+            shape = build_result.results[0].shape
 
-    # The exporters will add extra output that we do not want, so suppress it
-    with helpers.suppress_stdout_stderr():
-        # There should be a shape in the build results
-        shape = build_result.results[0].shape
+            # assembly or a single object?
+            if type(shape).__name__ == "Assembly":
+                # use assembly save method
+                shape.save(temp_file, "STEP")
+            else:
+                # Put the STEP output into the temp file
+                exporters.export(shape, temp_file, exporters.ExportTypes.STEP)
 
-        # assembly or a single object?
-        if type(shape).__name__ == "Assembly":
-            # use assembly save method
-            shape.save(temp_file)
-        else:
-            # Put the STEP output into the temp file
-            exporters.export(shape, temp_file, exporters.ExportTypes.STEP)
+        # The output has already been written where it needs to go
+        if output_file != None:
+            return None
 
-    # Read the STEP output back in
-    with open(temp_file, "r") as file:
-        step_str = file.read()
+        # Read the STEP output back in
+        step_str = helpers.read_output(temp_file)
 
     return step_str
@@ -1,43 +1,46 @@
-import os, tempfile
-from cadquery import exporters
-import cadquery as cq
+from OCP.StlAPI import StlAPI_Writer
 import cq_cli.cqcodecs.codec_helpers as helpers
+from cq_cli.cqcodecs import tessellation
 
+# StlAPI_Writer never seeks, even in binary mode, so the output can go through a pipe
+STREAMS_OUTPUT = True
 
-def convert(build_result, output_file=None, error_file=None, output_opts=None):
-    # Create a temporary file to put the STL output into
-    temp_dir = tempfile.gettempdir()
-    temp_file = os.path.join(temp_dir, "temp_stl.stl")
 
-    linearDeflection = 0.1
-    angularDeflection = 0.1
+def convert(build_result, output_file=None, error_file=None, output_opts=None):
+    # Write each level of detail to its own file, reusing the built shapes
+    lods = helpers.lod_outputs(output_file, output_opts)
+    if lods != None:
+        for lod_file, lod_opts in lods:
+            convert(build_result, lod_file, error_file, lod_opts)
+        return None
 
     # If the user has provided the deflection settings, use them
-    if output_opts and "linearDeflection" in output_opts:
-        linearDeflection = output_opts["linearDeflection"]
-    if output_opts and "angularDeflection" in output_opts:
-        angularDeflection = output_opts["angularDeflection"]
+    linearDeflection, angularDeflection = helpers.mesh_deflections(output_opts)
 
     use_ascii = True
     if output_opts and "binary" in output_opts:
         use_ascii = not output_opts["binary"]
 
-    # The exporters will add extra output that we do not want, so suppress it
-    with helpers.suppress_stdout_stderr():
-        # There should be a shape in the build results
-        result = build_result.results[0].shape
-
-        # If the build result is an assembly, we have to make it a compound before trying to export it as SVG
-        if type(result).__name__ == "Assembly":
-            result = result.toCompound()
-        else:
-            result = result.val()
-
-        # Put the STL output into the temp file
-        result.exportStl(temp_file, linearDeflection, angularDeflection, use_ascii)
-
-    # Read the STL output back in
-    with open(temp_file, "rb") as file:
-        stl_str = file.read()
+    # Export into a private temp file, unless the output can go straight to the output file
+    with helpers.export_path(output_file, "temp_stl.stl") as temp_file:
+        # The exporters will add extra output that we do not want, so suppress it
+        with helpers.suppress_stdout_stderr():
+            # There should be a shape in the build results. Assemblies are made into a compound.
+            result = tessellation.mesh_shape(build_result)
+
+            # Mesh through the cache shared with the other mesh codecs, then write that mesh out
+            tessellation.get_cache(build_result).mesh(
+                result, linearDeflection, angularDeflection
+            )
+            writer = StlAPI_Writer()
+            writer.ASCIIMode = use_ascii
+            writer.Write(result.wrapped, temp_file)
+
+        # The output has already been written where it needs to go
+        if output_file != None:
+            return None
+
+        # Read the STL output back in
+        stl_str = helpers.read_output(temp_file, "rb")
 
     return stl_str
@@ -1,23 +1,63 @@
-import os, tempfile
-from cadquery import exporters
+from os import path
 import cadquery as cq
+from cadquery.occ_impl.exporters.json import JsonMesh
 import cq_cli.cqcodecs.codec_helpers as helpers
+from cq_cli.cqcodecs import tessellation, threejs_compact
+
+# The JSON is written out in one go
+STREAMS_OUTPUT = True
 
 
 def convert(build_result, output_file=None, error_file=None, output_opts=None):
-    # Create a temporary file to put the STL output into
-    temp_dir = tempfile.gettempdir()
-    temp_file = os.path.join(temp_dir, "temp_threejs.json")
+    # Write each level of detail to its own file, reusing the built shapes
+    lods = helpers.lod_outputs(output_file, output_opts)
+    if lods != None:
+        for lod_file, lod_opts in lods:
+            convert(build_result, lod_file, error_file, lod_opts)
+        return None
+
+    # If the user has provided the deflection settings, use them
+    linearDeflection, angularDeflection = helpers.mesh_deflections(output_opts)
 
     # The exporters will add extra output that we do not want, so suppress it
     with helpers.suppress_stdout_stderr():
-        # Put the STEP output into the temp file
-        exporters.export(
-            build_result.results[0].shape, temp_file, exporters.ExportTypes.TJS
+        result = build_result.results[0].shape
+
+        # Workplanes with several objects are exported together, like exporters.export() does
+        if isinstance(result, cq.Workplane) and len(result.vals()) > 1:
+            shape = cq.Compound.makeCompound(
+                [v for v in result.vals() if isinstance(v, cq.Shape)]
+            )
+        else:
+            shape = tessellation.mesh_shape(build_result)
+
+        # Reuse the triangulation shared with the other mesh codecs
+        vertices, triangles = tessellation.get_cache(build_result).tessellate(
+            shape, linearDeflection, angularDeflection
         )
 
-    # Read the STEP output back in
-    with open(temp_file, "r") as file:
-        tjs_str = file.read()
+        if output_opts and output_opts.get("compact"):
+            # Quantized and indexed binary arrays, either embedded or in a .bin file next to the output
+            buffer_file = None
+            if output_opts.get("externalBuffers"):
+                if output_file == None:
+                    raise ValueError("External buffers require an outfile")
+                buffer_file = path.splitext(output_file)[0] + ".bin"
+
+            tjs_str = threejs_compact.compact_json(vertices, triangles, buffer_file)
+        else:
+            # Build the same JSON that exporters.export() produces for TJS
+            mesher = JsonMesh()
+            for v in vertices:
+                mesher.addVertex(v.x, v.y, v.z)
+            for ixs in triangles:
+                mesher.addTriangleFace(*ixs)
+            tjs_str = mesher.toJson()
+
+    # Write straight to the output file if there is one
+    if output_file != None:
+        with open(output_file, "w") as file:
+            file.write(tjs_str)
+        return None
 
     return tjs_str
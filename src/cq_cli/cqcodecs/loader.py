@@ -1,14 +1,51 @@
 import os
 import importlib
 import pkgutil
+from collections.abc import Mapping
+from functools import partial
+from importlib.metadata import entry_points
+
+# Third-party packages can register codecs under this entry point group
+ENTRY_POINT_GROUP = "cq_cli.codecs"
+
+
+class LazyCodecs(Mapping):
+    """
+    Maps codec module names (cq_codec_*) to codec modules, only importing a codec the first time it is looked up.
+    """
+
+    def __init__(self, importers):
+        self._importers = importers
+        self._modules = {}
+
+    def __getitem__(self, name):
+        if name not in self._modules:
+            self._modules[name] = self._importers[name]()
+        return self._modules[name]
+
+    # Mapping's version looks the codec up, which would import it
+    def __contains__(self, name):
+        return name in self._importers
+
+    def __iter__(self):
+        return iter(self._importers)
+
+    def __len__(self):
+        return len(self._importers)
 
 
 def load_codecs():
     cq_codecs = {}
 
-    # Search all of the modules in the current directory to find codecs
+    # Search all of the modules in the current directory to find codecs, without importing them
     for finder, name, ispkg in pkgutil.iter_modules([os.path.dirname(__file__)]):
         if name.startswith("cq_codec_"):
-            cq_codecs[name] = importlib.import_module("cq_cli.cqcodecs." + name)
+            cq_codecs[name] = partial(
+                importlib.import_module, "cq_cli.cqcodecs." + name
+            )
+
+    # Add the codecs that other packages have registered, without letting them replace the built-in ones
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        cq_codecs.setdefault("cq_codec_" + entry_point.name, entry_point.load)
 
-    return cq_codecs
+    return LazyCodecs(cq_codecs)
@@ -0,0 +1,172 @@
+import time
+import threading
+from OCP.BRepMesh import BRepMesh_IncrementalMesh
+from OCP.BRepTools import BRepTools
+from OCP.OSD import OSD_Parallel, OSD_ThreadPool
+from cq_cli import parallel
+
+# Codecs running in threads may try to attach a cache to the same build result at once
+_attach_lock = threading.Lock()
+
+# The number of threads that meshing is spread over, None meaning OCCT's default of one per core
+_mesh_threads = None
+
+
+def set_mesh_threads(threads):
+    """
+    Sets how many threads OCCT meshes the faces of a shape with. 1 turns parallel meshing off.
+    """
+    global _mesh_threads
+    _mesh_threads = threads
+
+    if threads > 1:
+        # OCCT's own pool has to be used, since the size of a TBB pool cannot be set from here
+        OSD_Parallel.SetUseOcctThreads_s(True)
+        OSD_ThreadPool.DefaultPool_s().Init(threads)
+
+
+def parallel_meshing():
+    """
+    Checks whether meshing should be spread over several threads. Forked conversion workers
+    mesh on one thread, since the threads of OCCT's pool do not survive the fork.
+    """
+    return _mesh_threads != 1 and not parallel.in_worker()
+
+
+class TessellationCache:
+    """
+    Shares meshing work between the mesh-based codecs that convert the same build result.
+
+    OCCT stores a triangulation on each face, so a shape only has to be meshed once for a given
+    pair of deflection settings, after which every exporter can use the stored triangulation.
+    The cache tracks which settings the stored triangulations were made with, and which shapes
+    have been meshed with them, so that it can skip repeat meshing and clean out triangulations
+    made with other settings before re-meshing.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+        # The deflection settings of the triangulations currently stored on the faces
+        self._settings = None
+        self._meshed = {}
+
+        self._tessellations = {}
+        self._compounds = {}
+
+        # One entry per request so that the work that was saved can be reported
+        self.timings = []
+
+    def _record(self, operation, hit, seconds):
+        self.timings.append({"operation": operation, "hit": hit, "seconds": seconds})
+
+    def compound(self, assy):
+        """
+        Returns the compound of an assembly, only creating it once so that codecs share its faces.
+        """
+        with self._lock:
+            if id(assy) not in self._compounds:
+                self._compounds[id(assy)] = (assy, assy.toCompound())
+            return self._compounds[id(assy)][1]
+
+    def mesh(self, shape, linearDeflection, angularDeflection):
+        """
+        Makes sure that the shape's faces carry a triangulation made with the given settings.
+        """
+        settings = (linearDeflection, angularDeflection)
+
+        with self._lock:
+            if self._settings == settings and id(shape) in self._meshed:
+                self._record("mesh", True, 0.0)
+                return
+
+            start = time.perf_counter()
+
+            # Existing triangulations may be finer than requested, and OCCT would keep them
+            if self._settings != settings:
+                for meshed_shape in self._meshed.values():
+                    BRepTools.Clean_s(meshed_shape.wrapped)
+                BRepTools.Clean_s(shape.wrapped)
+                self._settings = settings
+                self._meshed = {}
+                self._tessellations = {}
+
+            BRepMesh_IncrementalMesh(
+                shape.wrapped,
+                linearDeflection,
+                True,
+                angularDeflection,
+                parallel_meshing(),
+            )
+            self._meshed[id(shape)] = shape
+
+            self._record("mesh", False, time.perf_counter() - start)
+
+    def tessellate(self, shape, linearDeflection, angularDeflection):
+        """
+        Returns the vertices and triangles of the shape, as Shape.tessellate() does, reusing
+        the stored triangulation.
+        """
+        key = (id(shape), linearDeflection, angularDeflection)
+
+        with self._lock:
+            self.mesh(shape, linearDeflection, angularDeflection)
+
+            if key in self._tessellations:
+                self._record("tessellate", True, 0.0)
+                return self._tessellations[key]
+
+            start = time.perf_counter()
+            vertices, triangles = shape.tessellate(linearDeflection, angularDeflection)
+            self._tessellations[key] = (vertices, triangles)
+            self._record("tessellate", False, time.perf_counter() - start)
+
+            return vertices, triangles
+
+    def summary(self):
+        """
+        Summarizes the meshing that was done and estimates the time the cache saved.
+        """
+        summary = {}
+        for operation in ("mesh", "tessellate"):
+            entries = [t for t in self.timings if t["operation"] == operation]
+            misses = [t for t in entries if not t["hit"]]
+            hits = len(entries) - len(misses)
+            seconds = sum(t["seconds"] for t in misses)
+
+            summary[operation] = {
+                "requests": len(entries),
+                "hits": hits,
+                "seconds": seconds,
+                "seconds_saved": hits * seconds / len(misses) if misses else 0.0,
+            }
+
+        return summary
+
+
+def get_cache(build_result):
+    """
+    Returns the tessellation cache attached to a build result, attaching a new one if needed.
+    """
+    with _attach_lock:
+        cache = getattr(build_result, "tessellation_cache", None)
+        if cache == None:
+            cache = TessellationCache()
+            build_result.tessellation_cache = cache
+        return cache
+
+
+def mesh_shape(build_result):
+    """
+    Returns the shape that the mesh codecs should triangulate for the first build result.
+    """
+    result = build_result.results[0].shape
+
+    # Assemblies have to be turned into a compound, which should only be done once
+    if type(result).__name__ == "Assembly":
+        return get_cache(build_result).compound(result)
+
+    # A Workplane's first object, or a bare Shape
+    if hasattr(result, "val"):
+        return result.val()
+    return result
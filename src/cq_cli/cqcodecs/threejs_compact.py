@@ -0,0 +1,159 @@
+import json
+import base64
+from os import path
+
+# NumPy is optional, and only needed for the compact format
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Quantized positions use the full range of an unsigned 16 bit integer across the bounding box
+POSITION_STEPS = 65535
+
+# Quantized normals use a signed 8 bit integer for each component
+NORMAL_STEPS = 127
+
+# The arrays are quantized and encoded in ways that three.js's BufferGeometryLoader does not
+# read, so the document is labelled as a format of its own
+FORMAT_TYPE = "CQCompactGeometry"
+FORMAT_VERSION = 1
+
+
+def vertex_normals(positions, triangles):
+    """
+    Computes a normal for every vertex by adding up the normals of the triangles that use it,
+    weighted by their area.
+    """
+    corners = positions[triangles]
+    face_normals = np.cross(
+        corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]
+    )
+
+    normals = np.zeros_like(positions)
+    for corner in range(3):
+        np.add.at(normals, triangles[:, corner], face_normals)
+
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, lengths, out=normals, where=lengths > 0)
+    return normals
+
+
+def quantize(positions, normals, triangles):
+    """
+    Quantizes the positions across the bounding box and the normals to 8 bits, then merges
+    vertices that quantize to the same position and normal. Triangles that collapse are dropped.
+    """
+    box_min = positions.min(axis=0)
+    box_max = positions.max(axis=0)
+    extent = box_max - box_min
+    extent[extent == 0] = 1.0
+
+    q_positions = np.round((positions - box_min) / extent * POSITION_STEPS)
+    q_normals = np.round(normals * NORMAL_STEPS)
+
+    # Vertices on the edges between faces keep their own normals, so hard edges stay hard
+    keys = np.concatenate([q_positions, q_normals], axis=1).astype(np.int32)
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    triangles = inverse.reshape(-1)[triangles]
+
+    collapsed = (
+        (triangles[:, 0] == triangles[:, 1])
+        | (triangles[:, 1] == triangles[:, 2])
+        | (triangles[:, 0] == triangles[:, 2])
+    )
+    triangles = triangles[~collapsed]
+
+    return (
+        unique_keys[:, :3].astype("<u2"),
+        unique_keys[:, 3:].astype("i1"),
+        triangles,
+        box_min,
+        box_max,
+    )
+
+
+def compact_json(vertices, triangles, buffer_file=None):
+    """
+    Builds a compact JSON document from tessellated vertices and triangles, laid out like a
+    three.js BufferGeometry but not readable by its loader. Positions are stored as 16 bit
+    integers across the bounding box given in the document, so each coordinate is decoded
+    as min + q / 65535 * (max - min). Normals are 8 bit integers decoded as q / 127, and the
+    vertices are indexed. The binary arrays are little-endian, and are embedded as base64 or
+    written to buffer_file and referenced from the document.
+    """
+    if np == None:
+        raise ValueError("Compact ThreeJS output requires NumPy")
+
+    positions = np.array([(v.x, v.y, v.z) for v in vertices], dtype=np.float64)
+    triangles = np.array(triangles, dtype=np.int64).reshape(-1, 3)
+
+    if len(triangles) == 0:
+        positions = np.zeros((0, 3))
+        q_positions = np.zeros((0, 3), dtype="<u2")
+        q_normals = np.zeros((0, 3), dtype="i1")
+        box_min = box_max = np.zeros(3)
+    else:
+        normals = vertex_normals(positions, triangles)
+        q_positions, q_normals, triangles, box_min, box_max = quantize(
+            positions, normals, triangles
+        )
+
+    # Small meshes can use 16 bit indices
+    if len(q_positions) <= 65536:
+        index = triangles.astype("<u2")
+        index_type = "Uint16Array"
+    else:
+        index = triangles.astype("<u4")
+        index_type = "Uint32Array"
+
+    arrays = [
+        ("position", q_positions.tobytes()),
+        ("normal", q_normals.tobytes()),
+        ("index", index.tobytes()),
+    ]
+
+    # Either reference the arrays in an external buffer, or embed them
+    sources = {}
+    if buffer_file != None:
+        with open(buffer_file, "wb") as file:
+            offset = 0
+            for name, data in arrays:
+                sources[name] = {
+                    "uri": path.basename(buffer_file),
+                    "byteOffset": offset,
+                    "byteLength": len(data),
+                }
+
+                # Keep every array aligned to 4 bytes
+                padding = b"\0" * (-len(data) % 4)
+                file.write(data + padding)
+                offset += len(data) + len(padding)
+    else:
+        for name, data in arrays:
+            sources[name] = {"base64": base64.b64encode(data).decode("ascii")}
+
+    document = {
+        "metadata": {
+            "version": FORMAT_VERSION,
+            "type": FORMAT_TYPE,
+            "generator": "cq-cli",
+        },
+        "data": {
+            "attributes": {
+                "position": dict(
+                    sources["position"],
+                    itemSize=3,
+                    type="Uint16Array",
+                    normalized=True,
+                ),
+                "normal": dict(
+                    sources["normal"], itemSize=3, type="Int8Array", normalized=True
+                ),
+            },
+            "index": dict(sources["index"], type=index_type),
+            "boundingBox": {"min": box_min.tolist(), "max": box_max.tolist()},
+        },
+    }
+
+    return json.dumps(document, separators=(",", ":"))
@@ -0,0 +1,266 @@
+import importlib
+import io
+import json
+import os
+import re
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+
+# Unix domain sockets are preferred, but fall back to a localhost port where they are not available.
+# The socket goes in the user's runtime directory, or is named after the user in the shared
+# temp directory, so that users on the same machine do not end up sharing a daemon.
+if hasattr(socket, "AF_UNIX"):
+    if os.path.isdir(os.environ.get("XDG_RUNTIME_DIR", "")):
+        DEFAULT_ADDRESS = os.path.join(os.environ["XDG_RUNTIME_DIR"], "cq-cli.sock")
+    else:
+        DEFAULT_ADDRESS = os.path.join(
+            tempfile.gettempdir(), "cq-cli-%d.sock" % os.getuid()
+        )
+else:
+    DEFAULT_ADDRESS = "127.0.0.1:47800"
+
+
+def parse_address(address):
+    """
+    Splits a daemon address into a socket family and something that socket can bind or connect to.
+    Addresses in the form host:port are TCP, anything else is treated as a Unix domain socket path.
+    """
+    match = re.match(r"^([\w.\-]*):(\d+)$", address)
+    if match:
+        host = match.group(1) or "127.0.0.1"
+        return socket.AF_INET, (host, int(match.group(2)))
+
+    return socket.AF_UNIX, address
+
+
+def check_socket_owner(path):
+    """
+    Raises a ValueError if the Unix domain socket at path belongs to another user, who
+    would otherwise get to see and answer the conversions sent to it.
+    """
+    info = os.lstat(path)
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        raise ValueError("The socket %s belongs to another user" % path)
+
+
+def remove_stale_socket(path):
+    """
+    Removes the socket left behind by a daemon that did not shut down cleanly. Anything
+    else at the path, including a socket that a daemon is still listening on, is left alone
+    and a ValueError is raised instead.
+    """
+    try:
+        info = os.lstat(path)
+    except FileNotFoundError:
+        return
+
+    if not stat.S_ISSOCK(info.st_mode):
+        raise ValueError("%s already exists and is not a socket" % path)
+    check_socket_owner(path)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            os.remove(path)
+            return
+
+    raise ValueError("A daemon is already listening on " + path)
+
+
+def strip_connect_argument(argv, address):
+    """
+    Removes the --connect option (and its value, if one was given) from a command line.
+    """
+    stripped = []
+    skip_value = False
+    for arg in argv:
+        if skip_value:
+            skip_value = False
+            if arg == address:
+                continue
+
+        if arg == "--connect":
+            skip_value = True
+            continue
+        if arg.startswith("--connect="):
+            continue
+
+        stripped.append(arg)
+
+    return stripped
+
+
+def read_request(rfile):
+    """
+    Reads a JSON request header line from the socket.
+    """
+    header = rfile.readline()
+    if not header:
+        return None
+
+    return json.loads(header.decode("utf-8"))
+
+
+class CLIRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Runs one forwarded command line per connection and sends back the exit code and output.
+    """
+
+    def handle(self):
+        from cq_cli.runner import run_cli
+
+        request = read_request(self.rfile)
+        if request == None:
+            return
+
+        stdin_data = request.get("stdin")
+        if stdin_data != None:
+            stdin_data = stdin_data.encode("utf-8")
+
+        exit_code, out, err = run_cli(request["argv"], request.get("cwd"), stdin_data)
+
+        # The header says how many raw stdout and stderr bytes follow it
+        header = {"exit_code": exit_code, "stdout": len(out), "stderr": len(err)}
+        self.wfile.write(json.dumps(header).encode("utf-8") + b"\n")
+        self.wfile.write(out)
+        self.wfile.write(err)
+
+
+class ForkingTCPServer(socketserver.ForkingMixIn, socketserver.TCPServer):
+    """
+    Handles every connection in a forked copy of the daemon.
+    """
+
+
+class ForkingUnixStreamServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """
+    Handles every connection in a forked copy of the daemon.
+    """
+
+
+def warm_up(preload=None):
+    """
+    Imports CadQuery, CQGI and every codec so that requests do not pay for it,
+    along with any extra modules the user scripts are known to import.
+    """
+    import cadquery
+    from cadquery import cqgi
+    from cq_cli.cqcodecs import loader
+
+    codecs = loader.load_codecs()
+    for name in codecs:
+        codecs[name]
+
+    # Libraries usually sit next to the scripts, where the daemon is started from
+    if preload and os.getcwd() not in sys.path:
+        sys.path.append(os.getcwd())
+
+    for module_name in preload or []:
+        importlib.import_module(module_name)
+
+
+def create_server(address, handler_class=CLIRequestHandler, prefork=False):
+    """
+    Creates a socket server bound to the given daemon address.
+    With prefork, each connection is handled in a forked child so that no state is
+    carried over from one conversion to the next.
+    """
+    family, bind_address = parse_address(address)
+
+    if prefork and not hasattr(os, "fork"):
+        raise ValueError("--prefork requires a platform that supports fork")
+
+    if family == socket.AF_INET:
+        server_class = ForkingTCPServer if prefork else socketserver.TCPServer
+        return server_class(bind_address, handler_class)
+
+    # Clean up after a daemon that did not shut down cleanly
+    remove_stale_socket(bind_address)
+
+    server_class = ForkingUnixStreamServer if prefork else socketserver.UnixStreamServer
+    server = server_class(bind_address, handler_class)
+
+    # Only the user running the daemon should be able to submit scripts to it
+    os.chmod(bind_address, 0o600)
+
+    return server
+
+
+def serve(address, prefork=False, preload=None):
+    """
+    Loads CadQuery once and then services forwarded command lines until interrupted.
+    """
+    warm_up(preload)
+
+    server = create_server(address, prefork=prefork)
+    print("cq-cli daemon listening on " + address, file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if server.address_family != socket.AF_INET and os.path.exists(address):
+            os.remove(address)
+
+
+def forward(address, argv):
+    """
+    Sends a command line to a running daemon and relays its output.
+    Returns the exit code of the remote run, or None if no daemon could be reached.
+    """
+    family, connect_address = parse_address(address)
+
+    # Only hand scripts to a daemon run by the same user
+    if family != socket.AF_INET:
+        try:
+            check_socket_owner(connect_address)
+        except OSError:
+            return None
+        except ValueError as err:
+            print(str(err) + ", running in-process instead", file=sys.stderr)
+            return None
+
+    try:
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.connect(connect_address)
+    except OSError:
+        return None
+
+    request = {"argv": argv, "cwd": os.getcwd(), "stdin": None}
+
+    # The script comes from stdin when there is no infile, so ship that along too
+    if "--infile" not in argv and not any(a.startswith("--infile=") for a in argv):
+        if not sys.stdin.isatty():
+            request["stdin"] = sys.stdin.read()
+
+    with sock:
+        rfile = sock.makefile("rb")
+        try:
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            header = read_request(rfile)
+        except OSError:
+            header = None
+
+        if header == None:
+            # The script has already been read from stdin, so hand it back for the local run
+            if request["stdin"] != None:
+                sys.stdin = io.TextIOWrapper(
+                    io.BytesIO(request["stdin"].encode("utf-8")), encoding="utf-8"
+                )
+            return None
+
+        out = rfile.read(header["stdout"])
+        err = rfile.read(header["stderr"])
+
+    sys.stdout.buffer.write(out)
+    sys.stdout.flush()
+    sys.stderr.buffer.write(err)
+    sys.stderr.flush()
+
+    return header["exit_code"]
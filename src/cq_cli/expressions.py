@@ -0,0 +1,76 @@
+import re
+import threading
+import traceback
+
+# Marks the show_object() result that carries the script's namespace rather than a shape
+NAMESPACE_OPTION = "cq_cli_namespace"
+
+
+class ExpressionError(Exception):
+    """
+    Raised when an expression cannot be evaluated. The message holds the traceback.
+    """
+
+
+def add_namespace_capture(script_str):
+    """
+    Adds a line to the end of a script that hands its global namespace back through show_object(),
+    so that expressions can be evaluated against it after a single run of the script.
+    """
+    return (
+        script_str + "\nshow_object(globals(), options={%r: True})" % NAMESPACE_OPTION
+    )
+
+
+def expression_name(expression):
+    """
+    Turns an expression into something that can be used in a file name.
+    """
+    return re.sub(r"\W+", "_", expression).strip("_")
+
+
+class ExpressionEvaluator:
+    """
+    Evaluates expressions in the namespace left behind by a build of a script that had
+    add_namespace_capture() applied to it.
+    """
+
+    def __init__(self, build_result):
+        self.namespace = {}
+
+        # Take the namespace out of the results so that codecs never see it
+        results = []
+        for shape_result in build_result.results:
+            if (shape_result.options or {}).get(NAMESPACE_OPTION):
+                self.namespace = shape_result.shape
+            else:
+                results.append(shape_result)
+        build_result.results = results
+        build_result.first_result = results[0] if len(results) > 0 else None
+
+        self._lock = threading.Lock()
+        self._results = {}
+
+    def result(self, expression):
+        """
+        Evaluates an expression and returns a build result holding what it evaluated to.
+        Each expression is only evaluated once, however many codecs convert it.
+        """
+        from cadquery import cqgi
+
+        with self._lock:
+            if expression not in self._results:
+                try:
+                    shape = eval(expression, self.namespace)
+                except Exception:
+                    raise ExpressionError(traceback.format_exc())
+
+                shape_result = cqgi.ShapeResult()
+                shape_result.shape = shape
+                shape_result.options = {}
+
+                build_result = cqgi.BuildResult()
+                build_result.set_success_result([shape_result])
+                self._results[expression] = build_result
+
+            return self._results[expression]
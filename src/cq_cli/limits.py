@@ -0,0 +1,268 @@
+import os
+import sys
+import signal
+import threading
+import subprocess
+
+# The resource module is not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Exit codes for runs that were stopped for going over their limits
+TIMEOUT_EXIT_CODE = 150
+MEMORY_EXIT_CODE = 151
+
+# How often the memory used by a limited run is checked, in seconds
+MEMORY_POLL_INTERVAL = 0.1
+
+# Set in the environment of the child process, so that it knows to run the conversion itself
+CHILD_ENV = "CQ_CLI_LIMITED_CHILD"
+
+
+def in_child():
+    """
+    Checks whether this process is the child that a limited run started.
+    """
+    return os.environ.get(CHILD_ENV) == "1"
+
+
+def limit_arguments(timeout, max_memory):
+    """
+    Builds the command line options that pass the limits on to another run.
+    """
+    argv = []
+    if timeout != None:
+        argv += ["--timeout", str(timeout)]
+    if max_memory != None:
+        argv += ["--max-memory", str(max_memory)]
+    return argv
+
+
+def check_supported(max_memory):
+    """
+    Raises a ValueError if the limits cannot be enforced on this platform.
+    """
+    if max_memory != None and resource == None:
+        raise ValueError("--max-memory is not supported on this platform")
+
+
+def can_watch_memory():
+    """
+    Checks whether the memory that a child process and its workers use can be read from /proc.
+    """
+    return os.path.isdir("/proc/self") and hasattr(os, "killpg")
+
+
+def session_memory(session_id):
+    """
+    Adds up the resident memory, in bytes, of every process in a session.
+    """
+    total = 0
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+
+        try:
+            with open(os.path.join("/proc", name, "stat"), "r") as file:
+                stat = file.read()
+        except OSError:
+            continue
+
+        # The fields after the command name start at the process state, the third field
+        fields = stat.rsplit(")", 1)[1].split()
+        if int(fields[3]) == session_id:
+            total += int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+
+    return total
+
+
+def watch_memory(proc, max_memory, stopped, exceeded):
+    """
+    Kills a child process and its workers once their resident memory goes over max_memory
+    megabytes, setting the exceeded event first. Runs until the stopped event is set.
+    """
+    limit = max_memory * 1024 * 1024
+    while not stopped.wait(MEMORY_POLL_INTERVAL):
+        try:
+            if session_memory(proc.pid) > limit:
+                exceeded.set()
+                os.killpg(proc.pid, signal.SIGKILL)
+                return
+        except ProcessLookupError:
+            return
+
+
+def kill_child(proc):
+    """
+    Kills a child process, along with any workers it forked where it has a session of its own.
+    """
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
+
+
+def apply_memory_limit(max_memory):
+    """
+    Caps the address space of this process, so that allocations past the limit fail
+    with a MemoryError rather than pushing the rest of the machine into swap. This is
+    only used where the memory of the child cannot be watched, since the address space
+    is much larger than the memory in use. Loading CadQuery alone maps about 1 GB.
+    """
+    if max_memory == None:
+        return
+
+    limit = int(max_memory * 1024 * 1024)
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def load_cadquery(errfile):
+    """
+    Loads CadQuery under the address space cap, so that a cap too small to load it is
+    reported as running out of memory rather than as a broken install.
+    """
+    try:
+        import cadquery
+    except (ImportError, MemoryError) as err:
+        report("Unable to load CadQuery within the memory limit: " + str(err), errfile)
+        sys.exit(MEMORY_EXIT_CODE)
+
+
+def error_exit_code(err, default):
+    """
+    Works out the exit code for an error, which is MEMORY_EXIT_CODE if the run ran out of memory.
+    """
+    if isinstance(err, MemoryError):
+        return MEMORY_EXIT_CODE
+    return default
+
+
+def child_command(argv):
+    """
+    Works out the command line that runs cq-cli again with the same arguments.
+    """
+    # Standalone builds are their own interpreter
+    if getattr(sys, "frozen", False):
+        return [sys.executable] + argv
+
+    main_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    return [sys.executable, main_file] + argv
+
+
+def report(message, errfile, append=False):
+    """
+    Sends a limit error to wherever the user asked for errors to go.
+    """
+    if errfile == None:
+        print(message, file=sys.stderr)
+    else:
+        with open(errfile, "a" if append else "w") as file:
+            file.write(message + "\n")
+
+
+def relay(data, stream):
+    """
+    Passes the output of the child on to this process's output.
+    """
+    if not data:
+        return
+
+    if hasattr(stream, "buffer"):
+        stream.buffer.write(data)
+    else:
+        stream.write(data.decode("utf-8", "replace"))
+    stream.flush()
+
+
+def run_limited(argv, timeout, max_memory, errfile, read_stdin):
+    """
+    Runs the conversion in a child process that is stopped if it takes longer than timeout
+    seconds or uses more than max_memory megabytes. Returns the exit code of the run.
+    """
+    env = dict(os.environ)
+    env[CHILD_ENV] = "1"
+
+    # The child cannot read a script from the terminal, so hand it whatever was piped in
+    stdin_data = None
+    if read_stdin and not sys.stdin.isatty():
+        stdin_data = sys.stdin.read().encode("utf-8")
+
+    # A session of its own lets the child be killed along with any workers it forks
+    proc = subprocess.Popen(
+        child_command(argv),
+        stdin=subprocess.PIPE if stdin_data != None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+        start_new_session=hasattr(os, "killpg"),
+    )
+
+    # Where it can, this process stops the child once its resident memory goes over the limit
+    stopped = threading.Event()
+    exceeded = threading.Event()
+    if max_memory != None and can_watch_memory():
+        threading.Thread(
+            target=watch_memory,
+            args=(proc, max_memory, stopped, exceeded),
+            daemon=True,
+        ).start()
+
+    # The child has a session of its own, so nothing else stops it if this process is stopped
+    try:
+        out, err = proc.communicate(stdin_data, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill_child(proc)
+        out, err = proc.communicate()
+
+        relay(out, sys.stdout)
+        relay(err, sys.stderr)
+        report(
+            "Timeout error: the conversion did not finish within %g seconds and was stopped."
+            % timeout,
+            errfile,
+        )
+        return TIMEOUT_EXIT_CODE
+    except KeyboardInterrupt:
+        kill_child(proc)
+        proc.wait()
+        return 128 + signal.SIGINT
+    except BaseException:
+        kill_child(proc)
+        proc.wait()
+        raise
+    finally:
+        stopped.set()
+
+    relay(out, sys.stdout)
+    relay(err, sys.stderr)
+
+    # Running out of memory either fails an allocation in the child, which exits with its
+    # own code, or has the child killed by the watcher
+    exit_code = proc.returncode
+    if max_memory != None and (exit_code == MEMORY_EXIT_CODE or exceeded.is_set()):
+        report(
+            "Memory error: the conversion went over its %s MB memory limit and was stopped."
+            % max_memory,
+            errfile,
+            append=exit_code == MEMORY_EXIT_CODE,
+        )
+        return MEMORY_EXIT_CODE
+
+    # Any other signal, such as a crash, is passed on the way a shell would report it
+    if exit_code < 0:
+        report(
+            "Error: the conversion was stopped by signal %d." % -exit_code,
+            errfile,
+            append=True,
+        )
+        return 128 - exit_code
+
+    return exit_code
@@ -12,22 +12,38 @@ import sys
 sys.path.append(os.path.dirname(__file__) + "/..")
 
 import argparse
-import cadquery as cq
-from cadquery import cqgi
+import contextlib
+import functools
 import fileinput
 import traceback
 import json
-from cq_cli.cqcodecs import loader
+from cq_cli.cqcodecs import codec_helpers, loader
+from cq_cli import (
+    cache,
+    compressors,
+    daemon,
+    expressions,
+    limits,
+    parallel,
+    parameters,
+    profiling,
+    script_cache,
+    server,
+    spool,
+    sweep,
+    watch,
+)
 
 
 def handle_freecad_file(file_path, params=None):
     """
     Wrapper method that takes care of importing a FreeCAD file and applying parameters to it.
     """
+    from cadquery import cqgi
     from cadquery_freecad_import_plugin.plugin import import_freecad_part
 
     # Construct a build result so that the rest of the code can handle it
-    build_result = cq.cqgi.BuildResult()
+    build_result = cqgi.BuildResult()
 
     # Only apply parameters if there are any
     if params != None and len(params) > 0:
@@ -38,14 +54,14 @@ def handle_freecad_file(file_path, params=None):
 
         # Import the FreeCAD file using the parametric method
         result = import_freecad_part(file_path, freecad_params)
-        shape_result = cq.cqgi.ShapeResult()
+        shape_result = cqgi.ShapeResult()
         shape_result.shape = result
         build_result.results.append(shape_result)
         build_result.success = True
     else:
         # Import the FreeCAD file without applying parameters
         result = import_freecad_part(file_path)
-        shape_result = cq.cqgi.ShapeResult()
+        shape_result = cqgi.ShapeResult()
         shape_result.shape = result
         build_result.results.append(shape_result)
         build_result.success = True
@@ -53,11 +69,11 @@ def handle_freecad_file(file_path, params=None):
     return build_result
 
 
-def build_and_parse(script_str, params, errfile, expression):
+def build_and_parse(script_str, params, errfile, expression, build_cache=None):
     """
     Uses CQGI to parse and build a script, substituting in parameters if any were supplied.
+    If a build cache is given, identical builds are loaded from it instead of being re-run.
     """
-
     # We need to do a broad try/catch to let the user know if something higher-level fails
     try:
         # If we have a freecad file, handle it differently
@@ -67,8 +83,34 @@ def build_and_parse(script_str, params, errfile, expression):
             # Do the CQGI handling of the script here and, if successful, pass the build result to the codec
             if expression != None:
                 script_str += "\nshow_object({expr})".format(expr=expression)
-            cqModel = cqgi.parse(script_str)
-            build_result = cqModel.build(params)
+
+            build_result = None
+            if build_cache != None:
+                with profiling.phase("cache lookup"):
+                    cache_key = build_cache.key(script_str, params, expression)
+                    build_result = build_cache.load(cache_key)
+
+            if build_result == None:
+                # Remember what was imported before the build so user modules can be tracked
+                modules_before = set(sys.modules)
+
+                # Long-lived processes reuse the parsed script when it is built again
+                with profiling.phase("parse"):
+                    cqModel = script_cache.parse(script_str)
+                with profiling.phase("build"):
+                    build_result = cqModel.build(
+                        script_cache.build_params(cqModel, params)
+                    )
+
+                if build_cache != None and build_result.success:
+                    try:
+                        with profiling.phase("cache store"):
+                            build_cache.store(cache_key, build_result, modules_before)
+                    except OSError as err:
+                        print(
+                            "Unable to write to the build cache: " + str(err),
+                            file=sys.stderr,
+                        )
 
         # Handle the case of the build not being successful, otherwise pass the codec the build result
         if not build_result.success:
@@ -76,7 +118,7 @@ def build_and_parse(script_str, params, errfile, expression):
             raise (build_result.exception)
         else:
             return build_result
-    except Exception:
+    except Exception as err:
         out_tb = traceback.format_exc()
 
         # If there was an error file specified write to that, otherwise send it to stderr
@@ -87,7 +129,7 @@ def build_and_parse(script_str, params, errfile, expression):
             print(str(out_tb), file=sys.stderr)
 
         # Let the caller know what happened
-        sys.exit(100)
+        sys.exit(limits.error_exit_code(err, 100))
 
     # Return None here to prevent a failed build from slipping through
     return None
@@ -183,7 +225,88 @@ def get_params_from_file(param_json_path, errfile):
     return param_dict
 
 
-def main():
+def write_converted(converted, outfile, compressed=None):
+    """
+    Writes the output of a codec to the outfile, or to stdout if there is no outfile.
+    Output that is to be compressed is finished off by the CompressedOutput the codec exported to.
+    """
+    if compressed != None:
+        compressed.finish(converted)
+        return
+
+    # If converted is None, assume that the output was written to file directly by the codec
+    if converted == None:
+        return
+
+    # Write the converted output to the appropriate place based on the command line arguments
+    if outfile == None:
+        if isinstance(converted, (bytes, bytearray)):
+            sys.stdout.buffer.write(converted)
+        else:
+            print(converted)
+    else:
+        if isinstance(converted, str):
+            with open(outfile, "w") as file:
+                file.write(converted)
+        elif isinstance(converted, (bytes, bytearray)):
+            with open(outfile, "wb") as file:
+                file.write(converted)
+        else:
+            raise TypeError(
+                "Expected converted output to be str, bytes, or bytearray. Got '%s'"
+                % type(converted).__name__
+            )
+
+
+def output_name(codec_module, outfile):
+    """
+    Describes one output of a run, i.e. for profiling reports.
+    """
+    codec_name = codec_module.__name__.split(".")[-1].replace("cq_codec_", "")
+    return "%s (%s)" % (codec_name, outfile if outfile != None else "stdout")
+
+
+def safe_file_name(name):
+    """
+    Makes a result name safe to put in an output file path, so that it cannot reach outside the
+    directory the template points at: path separators become underscores, as do the dots of
+    a name that is nothing but dots.
+    """
+    name = name.replace("/", "_").replace("\\", "_")
+    if name.strip(".") == "":
+        name = name.replace(".", "_")
+    return name
+
+
+def result_names(object_results):
+    """
+    Works out the file-name-safe name of each show_object() result. Results that end up with
+    the same name get their index added, so that they do not overwrite each other's output.
+    """
+    names = []
+    for index, object_result in enumerate(object_results):
+        name = safe_file_name(
+            codec_helpers.result_name(object_result.first_result, index)
+        )
+        if name in names:
+            name = name + "_" + str(index)
+        names.append(name)
+    return names
+
+
+def result_outfile(template, index, name):
+    """
+    Works out the output file for one show_object() result when every result is exported.
+    The outfile can be a template using {index} and {name}, otherwise the index is added to the file name.
+    """
+    if "{index}" in template or "{name}" in template:
+        return template.replace("{index}", str(index)).replace("{name}", name)
+
+    base, extension = os.path.splitext(template)
+    return base + "_" + str(index) + extension
+
+
+def main(argv=None):
     outfile = None
     outfiles = None
     errfile = None
@@ -193,9 +316,6 @@ def main():
     params = {}
     output_opts = {}
 
-    # Find the codecs that have been added.
-    loaded_codecs = loader.load_codecs()
-
     # Parse the command line arguments
     parser = argparse.ArgumentParser(
         description="Command line utility for converting CadQuery script output to various other output formats."
@@ -228,14 +348,240 @@ def main():
     )
     parser.add_argument(
         "--validate",
-        help="Setting to true forces the CLI to only parse and validate the script and not produce converted output.",
+        help="Setting to true forces the CLI to only parse and validate the script and not produce converted output. Setting to syntax only checks that the script is valid Python, without building it.",
     )
     parser.add_argument(
         "--expression",
-        help="A python expression (such as `my_shape(x=5)`) to evaluate and render. This allows rendering different models/parts from the same python file.",
+        action="append",
+        help="A python expression (such as `my_shape(x=5)`) to evaluate and render. This allows rendering different models/parts from the same python file. Can be given more than once, in which case the script is run once and each expression is evaluated against it.",
+    )
+    parser.add_argument(
+        "--results",
+        choices=["first", "each", "assembly"],
+        default="first",
+        help="Which show_object() results to export. first (the default) exports only the first result, each exports every result to its own file using an outfile template with {index} and/or {name}, and assembly combines every result into one assembly.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="The number of conversions to run at the same time when there are multiple output files. Defaults to 1.",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=["gzip", "zstd", "xz"],
+        help="Compresses the output, to files and stdout. Output files are compressed as the codec writes them, except for codecs such as glb that go back over what they have written, whose output is exported to a private temp file and compressed from there. Output files ending in .gz, .zst or .xz are compressed to match without this option.",
+    )
+    parser.add_argument(
+        "--mesh-threads",
+        type=int,
+        help="The number of threads to mesh shapes with in the mesh-based codecs (STL, glTF, GLB and ThreeJS). Defaults to one per core, 1 turns parallel meshing off.",
+    )
+    parser.add_argument(
+        "--param-sweep",
+        help="A CSV or JSON lines file where each row is a set of parameters to build the script with. The outfile is used as a template that is filled in with the parameters of each row (and {index}), i.e. out/{width}_{height}.step",
+    )
+    parser.add_argument(
+        "--sweep-manifest",
+        help="File to write the JSON results manifest of a parameter sweep to. Prints to stdout if not specified.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Prints the wall time, CPU time and peak memory use of each phase of the conversion to stderr.",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="File to write the per-phase timing and memory report to as JSON. Implies profiling.",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Also records the peak Python heap use of each phase with tracemalloc. This slows the run down.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory in which to cache build results. Builds with the same script, parameters and expression are loaded from the cache instead of being re-run.",
     )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=cache.DEFAULT_CACHE_SIZE,
+        help="The maximum size of the build cache in megabytes. The least recently used builds are removed first. Defaults to %d."
+        % cache.DEFAULT_CACHE_SIZE,
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read from or write to the build cache, even if --cache-dir is set.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="Runs the conversion in a child process and stops it if it takes longer than this many seconds, exiting with code %d. With --http or --spool-dir, applies to each job."
+        % limits.TIMEOUT_EXIT_CODE,
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        help="Runs the conversion in a child process that is stopped if it uses more than this many megabytes of memory, exiting with code %d. Where the memory in use cannot be read from /proc, the address space is limited instead, which needs well over 1 GB. With --http or --spool-dir, applies to each job."
+        % limits.MEMORY_EXIT_CODE,
+    )
+    parser.add_argument(
+        "--serve",
+        nargs="?",
+        const=daemon.DEFAULT_ADDRESS,
+        help="Runs cq-cli as a daemon that keeps CadQuery and the codecs loaded between conversions. Listens on a Unix domain socket path or a localhost host:port address, defaulting to %s."
+        % daemon.DEFAULT_ADDRESS,
+    )
+    parser.add_argument(
+        "--connect",
+        nargs="?",
+        const=daemon.DEFAULT_ADDRESS,
+        help="Forwards the rest of the command line to a daemon started with --serve at the given address. Falls back to running in-process if no daemon is listening.",
+    )
+    parser.add_argument(
+        "--http",
+        nargs="?",
+        const=server.DEFAULT_ADDRESS,
+        metavar="ADDRESS",
+        help="Runs cq-cli as an HTTP server with build, convert and getparams endpoints that take JSON requests. Listens on a host:port address, defaulting to %s. Up to --jobs builds run at once, and identical requests share one build. Clients are not authenticated and can run any Python, so only bind it to localhost."
+        % server.DEFAULT_ADDRESS,
+    )
+    parser.add_argument(
+        "--queue-limit",
+        type=int,
+        default=server.DEFAULT_QUEUE_LIMIT,
+        help="Used with --http. The number of different builds that can be waiting or running before requests are turned away with a 503 status. Defaults to %d."
+        % server.DEFAULT_QUEUE_LIMIT,
+    )
+    parser.add_argument(
+        "--spool-dir",
+        help="Runs the job files that appear in this directory, up to --jobs at a time, until interrupted. Each job is claimed by renaming it, and its result is written to a .status.json file next to it.",
+    )
+    parser.add_argument(
+        "--prefork",
+        action="store_true",
+        help="Used with --serve. Runs each forwarded conversion in a forked copy of the warmed-up daemon, so that the modules and sys.path changes of one conversion cannot affect the next.",
+    )
+    parser.add_argument(
+        "--preload",
+        action="append",
+        help="Used with --serve, --http or --spool-dir. A module to import once at start-up, such as a parts library the scripts use. Can be given more than once.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keeps running and converts the infile again whenever it, its parameters file or the Python modules next to it change.",
+    )
+
+    if argv == None:
+        argv = sys.argv[1:]
+    args = parser.parse_args(argv)
+
+    #
+    # Daemon handling
+    #
+    # Keep CadQuery loaded and service requests until the daemon is stopped
+    # Only profile when asked to, since an earlier in-process run may have left it on
+    if args.profile or args.metrics_file != None:
+        profiling.start(args.profile_memory)
+    else:
+        profiling.stop()
+
+    try:
+        limits.check_supported(args.max_memory)
+    except ValueError as err:
+        print(str(err), file=sys.stderr)
+        sys.exit(2)
+
+    if args.serve != None:
+        try:
+            daemon.serve(args.serve, args.prefork, args.preload)
+        except (ValueError, ImportError) as err:
+            print(str(err), file=sys.stderr)
+            sys.exit(2)
+        return 0
+
+    # Serve conversions over HTTP until the server is stopped
+    if args.http != None:
+        try:
+            server.serve(
+                args.http,
+                max(1, args.jobs),
+                args.queue_limit,
+                args.preload,
+                limits.limit_arguments(args.timeout, args.max_memory),
+            )
+        except (ValueError, ImportError, OSError) as err:
+            print(str(err), file=sys.stderr)
+            sys.exit(2)
+        return 0
+
+    # Work through the job files in a spool directory until stopped
+    if args.spool_dir != None:
+        if not os.path.isdir(args.spool_dir):
+            print("The spool directory does not exist.", file=sys.stderr)
+            sys.exit(2)
+
+        try:
+            daemon.warm_up(args.preload)
+        except ImportError as err:
+            print(str(err), file=sys.stderr)
+            sys.exit(2)
+
+        return spool.spool(
+            args.spool_dir,
+            max(1, args.jobs),
+            limits.limit_arguments(args.timeout, args.max_memory),
+        )
+
+    # Hand the conversion off to a running daemon if there is one
+    if args.connect != None:
+        exit_code = daemon.forward(
+            args.connect, daemon.strip_connect_argument(argv, args.connect)
+        )
 
-    args = parser.parse_args()
+        # None means that no daemon was listening, so do the work here instead
+        if exit_code != None:
+            sys.exit(exit_code)
+
+    #
+    # Watch handling
+    #
+    # Convert again every time the script changes, keeping CadQuery loaded between conversions
+    if args.watch:
+        if args.infile == None:
+            print("--watch requires an infile.", file=sys.stderr)
+            sys.exit(2)
+
+        return watch.watch(argv, args.infile, args.params)
+
+    #
+    # Limit handling
+    #
+    # Run the conversion in a child process that can be stopped if it goes over its limits
+    if args.timeout != None or args.max_memory != None:
+        if limits.in_child():
+            # Where the parent can watch how much memory the child uses, it stops the child itself
+            if args.max_memory != None and not limits.can_watch_memory():
+                limits.apply_memory_limit(args.max_memory)
+                limits.load_cadquery(args.errfile)
+        else:
+            # The child writes its own profiling report
+            profiling.stop()
+            sys.exit(
+                limits.run_limited(
+                    argv,
+                    args.timeout,
+                    args.max_memory,
+                    args.errfile,
+                    args.infile == None,
+                )
+            )
+
+    # Find the codecs that have been added.
+    loaded_codecs = loader.load_codecs()
 
     # Make sure that the user has at least specified the validate or codec arguments
     if (
@@ -269,9 +615,47 @@ def main():
     if args.errfile != None:
         errfile = args.errfile
 
+    #
+    # Expression handling
+    #
+    # A single expression is added to the script, several are evaluated after one run of it
+    expression_list = args.expression or []
+    expression = None
+    if len(expression_list) == 1:
+        expression = expression_list[0]
+
     #
     # Validation handling
     #
+    # A syntax check only needs the script, so CadQuery is never loaded for it
+    if args.validate == "syntax":
+        script_str = get_script_from_infile(args.infile, outfile, errfile)
+        if script_str == None:
+            sys.exit(1)
+
+        try:
+            parameters.check_syntax(script_str)
+        except SyntaxError:
+            out_tb = traceback.format_exc()
+
+            # If there was an error file specified write to that, otherwise send it to stderr
+            if errfile != None:
+                with open(errfile, "w") as file:
+                    file.write(str(out_tb))
+            else:
+                print(str(out_tb), file=sys.stderr)
+
+            sys.exit(100)
+
+        # Let the user know that the validation was a success
+        if outfile != None:
+            with open(outfile, "w") as file:
+                file.write("validation_success")
+        else:
+            print("validation_success")
+
+        return 0
+
     # If the user wants to validate, do that and exit
     if args.validate == "true":
         script_str = get_script_from_infile(args.infile, outfile, errfile)
@@ -281,7 +665,25 @@ def main():
         # Set the PYTHONPATH variable to the current directory to allow module loading
         set_pythonpath_for_infile(args.infile)
 
-        build_result = build_and_parse(script_str, params, errfile, args.expression)
+        if len(expression_list) > 1:
+            build_result = build_and_parse(
+                expressions.add_namespace_capture(script_str), params, errfile, None
+            )
+
+            # Every expression has to evaluate for the script to be valid
+            evaluator = expressions.ExpressionEvaluator(build_result)
+            for expr in expression_list:
+                try:
+                    evaluator.result(expr)
+                except expressions.ExpressionError as err:
+                    if errfile != None:
+                        with open(errfile, "w") as file:
+                            file.write(str(err))
+                    else:
+                        print(str(err), file=sys.stderr)
+                    sys.exit(100)
+        else:
+            build_result = build_and_parse(script_str, params, errfile, expression)
 
         # Double-check that the build was a success
         if build_result != None and build_result.success:
@@ -311,50 +713,12 @@ def main():
         # Set the PYTHONPATH variable to the current directory to allow module loading
         set_pythonpath_for_infile(args.infile)
 
-        # A representation of the CQ script with all the metadata attached
-        cq_model = None
+        # The parameters are found without running the script or importing CadQuery
         try:
-            cq_model = cqgi.parse(script_str)
-        except Exception as err:
+            params = parameters.extract_parameters(script_str)
+        except SyntaxError as err:
             print("Script error: " + str(err), file=sys.stderr)
-
-        # Allows us to present parameters to users later that they can alter
-        parameters = cq_model.metadata.parameters
-
-        # Step through all the parameters and add them to the array of dictionaries
-        for param in parameters.values():
-            new_dict = {}
-
-            # Return the data type of the parameter, trying to match conventions set by other platforms
-            if param.varType.__name__ == "NumberParameterType":
-                new_dict["type"] = "number"
-            elif param.varType.__name__ == "StringParameterType":
-                new_dict["type"] = "string"
-            elif param.varType.__name__ == "BooleanParameterType":
-                new_dict["type"] = "boolean"
-
-            # Save the name of the parameter
-            new_dict["name"] = param.name
-
-            # If there is a description, save it
-            if param.desc:
-                new_dict["caption"] = param.desc
-
-            # If there is an initial value, save it
-            if param.default_value:
-                new_dict["initial"] = param.default_value
-
-            # If there are values set for valid values via describe_parameter(), add those
-            if param.valid_values:
-                new_dict["min"] = param.valid_values[0]
-                new_dict["max"] = param.valid_values[-1]
-                new_dict["step"] = new_dict["max"] - new_dict["min"]
-
-                # Ensure that the step is larger than 0
-                if new_dict["step"] <= 0:
-                    new_dict["step"] = 1
-
-            params.append(new_dict)
+            sys.exit(100)
 
         # Write the converted output to the appropriate place based on the command line arguments
         if args.getparams == "true":
@@ -381,7 +745,7 @@ def main():
     # Attempt to auto-detect the codec if the user has not set the option
     if args.outfile != None and args.codec == None:
         # Determine the codec from the file extension
-        codec_temp = args.outfile.split(".")[-1]
+        codec_temp = compressors.strip_suffix(args.outfile).split(".")[-1]
         if codec_temp != None:
             codec_temp = "cq_codec_" + codec_temp
             if codec_temp in loaded_codecs:
@@ -391,7 +755,7 @@ def main():
     if outfiles != None and codecs == None:
         codecs = []
         for i in range(len(outfiles)):
-            codec_temp = outfiles[i].split(".")[-1]
+            codec_temp = compressors.strip_suffix(outfiles[i]).split(".")[-1]
             if codec_temp != None:
                 # Construct the codec module name
                 codec_temp = "cq_codec_" + codec_temp
@@ -449,7 +813,8 @@ def main():
     infile = args.infile
 
     # Grab the script input from a file path or stdin
-    script_str = get_script_from_infile(infile, outfile, errfile)
+    with profiling.phase("read script"):
+        script_str = get_script_from_infile(infile, outfile, errfile)
     if script_str == None:
         sys.exit(1)
 
@@ -519,12 +884,154 @@ def main():
 
                 output_opts[opt_parts[0]] = op
 
+    #
+    # Output pairing
+    #
+    # Handle the case of multiple output files
+    if outfiles == None:
+        outfiles = [outfile]
+
+    # Pair each of the potential output files up with the codec that will produce it
+    conversions = []
+    for i in range(len(outfiles)):
+        if len(outfiles) > 1:
+            codec_module = active_codecs[i]
+        conversions.append((codec_module, outfiles[i]))
+
+    # Every result needs its own output file, so stdout cannot be used
+    if args.results == "each" and outfile == None:
+        print(
+            "Exporting each result needs an outfile template such as out/{name}.step",
+            file=sys.stderr,
+        )
+        sys.exit(2)
+
+    # Each expression needs its own output file, either from a template or from a list of outfiles
+    templated_outfiles = outfile != None and (
+        "{index}" in outfile or "{name}" in outfile
+    )
+    if len(expression_list) > 1:
+        if args.param_sweep != None or args.results != "first":
+            print(
+                "Multiple expressions cannot be combined with --param-sweep or --results.",
+                file=sys.stderr,
+            )
+            sys.exit(2)
+
+        if not templated_outfiles and len(conversions) != len(expression_list):
+            print(
+                "Multiple expressions need an outfile template such as out/{name}.step, or one outfile per expression.",
+                file=sys.stderr,
+            )
+            sys.exit(2)
+
+    #
+    # Compression handling
+    #
+    # Make sure the compressor can be used before any work is done
+    used_methods = set(
+        [args.compress] + [compressors.detect(o) for _, o in conversions]
+    ) - set([None])
+    for method in used_methods:
+        try:
+            compressors.check_available(method)
+        except ValueError as err:
+            print(str(err), file=sys.stderr)
+            sys.exit(2)
+
+    # Levels of detail and external buffers would be left uncompressed in the codec's temp dir
+    if used_methods and ("lods" in output_opts or output_opts.get("externalBuffers")):
+        print(
+            "Levels of detail and external buffers are written to separate files, so they cannot be compressed.",
+            file=sys.stderr,
+        )
+        sys.exit(2)
+
+    #
+    # Meshing threads
+    #
+    if args.mesh_threads != None:
+        from cq_cli.cqcodecs import tessellation
+
+        tessellation.set_mesh_threads(max(1, args.mesh_threads))
+
+    #
+    # Parameter sweep handling
+    #
+    # Parse the script once and build it for every row of parameters in the sweep file
+    if args.param_sweep != None:
+        # Rows always export their first result
+        if args.results != "first":
+            print(
+                "--results cannot be combined with --param-sweep.",
+                file=sys.stderr,
+            )
+            sys.exit(2)
+
+        # Each row needs its own output files, so stdout cannot be used
+        if outfile == None:
+            print(
+                "A parameter sweep needs an outfile template such as out/{width}_{height}.step",
+                file=sys.stderr,
+            )
+            sys.exit(2)
+
+        try:
+            rows = sweep.read_sweep_file(args.param_sweep)
+        except (OSError, ValueError) as err:
+            if errfile == None:
+                print(
+                    "Unable to read the parameter sweep: " + str(err), file=sys.stderr
+                )
+            else:
+                with open(errfile, "w") as file:
+                    file.write("Argument error: Unable to read the parameter sweep.")
+            sys.exit(2)
+
+        if expression != None:
+            script_str += "\nshow_object({expr})".format(expr=expression)
+
+        try:
+            cq_model = script_cache.parse(script_str)
+        except Exception:
+            out_tb = traceback.format_exc()
+            if errfile == None:
+                print(str(out_tb), file=sys.stderr)
+            else:
+                with open(errfile, "w") as file:
+                    file.write(str(out_tb))
+            sys.exit(100)
+
+        param_sweep = sweep.Sweep(
+            cq_model, params, conversions, errfile, output_opts, args.compress
+        )
+        records = sweep.run_sweep(param_sweep, rows, args.jobs)
+        sweep.write_manifest(records, args.sweep_manifest)
+
+        # Report the worst failure so that callers can tell something went wrong
+        sys.exit(max([r["exit_code"] for r in records] + [0]))
+
+    #
+    # Build cache handling
+    #
+    build_cache = None
+    if args.cache_dir != None and not args.no_cache:
+        build_cache = cache.BuildCache(args.cache_dir, args.cache_size)
+
     #
     # Parse and build the script.
     #
     build_result = None
     try:
-        build_result = build_and_parse(script_str, params, errfile, args.expression)
+        # The namespace that expressions are evaluated in cannot be cached
+        if len(expression_list) > 1:
+            build_result = build_and_parse(
+                expressions.add_namespace_capture(script_str), params, errfile, None
+            )
+        else:
+            build_result = build_and_parse(
+                script_str, params, errfile, expression, build_cache
+            )
 
         # If None was returned, it means the build failed and the exception has already been reported
         if build_result == None:
@@ -538,48 +1045,122 @@ def main():
                 file.write(str(err))
         sys.exit(100)
 
+    #
+    # Result selection
+    #
+    # Work out which build result each output file is converted from
+    if len(expression_list) > 1:
+        # The expressions are evaluated when they are converted, so that workers can share the work
+        evaluator = expressions.ExpressionEvaluator(build_result)
+        if templated_outfiles:
+            conversions = [
+                (
+                    codec_module,
+                    result_outfile(template, i, expressions.expression_name(expr)),
+                    functools.partial(evaluator.result, expr),
+                )
+                for i, expr in enumerate(expression_list)
+                for codec_module, template in conversions
+            ]
+        else:
+            conversions = [
+                (codec_module, outfile, functools.partial(evaluator.result, expr))
+                for (codec_module, outfile), expr in zip(conversions, expression_list)
+            ]
+    elif args.results == "each":
+        object_results = codec_helpers.split_results(build_result)
+        names = result_names(object_results)
+        conversions = [
+            (codec_module, result_outfile(template, i, names[i]), object_result)
+            for i, object_result in enumerate(object_results)
+            for codec_module, template in conversions
+        ]
+    elif args.results == "assembly":
+        combined_result = codec_helpers.results_to_assembly(build_result)
+        conversions = [
+            (codec_module, outfile, combined_result)
+            for codec_module, outfile in conversions
+        ]
+    else:
+        conversions = [
+            (codec_module, outfile, build_result)
+            for codec_module, outfile in conversions
+        ]
+
     #
     # Final build
     #
+    # Compressed output is exported to a pipe, or a temp file, and compressed from there
+    staging = contextlib.ExitStack()
+    compressed_outputs = []
+    for codec_module, outfile, _ in conversions:
+        method = args.compress or compressors.detect(outfile)
+        if method == None:
+            compressed_outputs.append(None)
+            continue
+
+        compressed_outputs.append(
+            staging.enter_context(
+                compressors.compressed_output(
+                    outfile, method, compressors.streams_output(codec_module)
+                )
+            )
+        )
+    codec_conversions = [
+        (
+            codec_module,
+            compressed.path if compressed != None else outfile,
+            conversion_result,
+        )
+        for (codec_module, outfile, conversion_result), compressed in zip(
+            conversions, compressed_outputs
+        )
+    ]
+
     # Build, parse and let the selected codec convert the CQ output
     try:
-        # Handle the case of multiple output files
-        if outfiles == None:
-            outfiles = [outfile]
-
-        # Step through all of the potential output files
-        for i in range(len(outfiles)):
-            outfile = outfiles[i]
-            if len(outfiles) > 1:
-                codec_module = active_codecs[i]
-
-            # Use the codec plugin to do the conversion
-            converted = codec_module.convert(
-                build_result, outfile, errfile, output_opts
-            )
+        if args.jobs > 1 and len(conversions) > 1:
+            # The conversions are independent once the model is built, so run them side by side
+            with profiling.phase("export (%d jobs)" % args.jobs):
+                converted_outputs = parallel.run_conversions(
+                    codec_conversions, errfile, output_opts, args.jobs
+                )
+            for (codec_module, outfile, _), compressed, converted in zip(
+                conversions, compressed_outputs, converted_outputs
+            ):
+                with profiling.phase("write " + output_name(codec_module, outfile)):
+                    write_converted(converted, outfile, compressed)
+        else:
+            for (
+                (codec_module, outfile, _),
+                compressed,
+                (_, codec_outfile, result),
+            ) in zip(conversions, compressed_outputs, codec_conversions):
+                name = output_name(codec_module, outfile)
+
+                # Expressions are evaluated on demand
+                if callable(result):
+                    with profiling.phase("evaluate " + name):
+                        result = result()
+
+                # Use the codec plugin to do the conversion
+                with profiling.phase("export " + name):
+                    converted = codec_module.convert(
+                        result, codec_outfile, errfile, output_opts
+                    )
+                with profiling.phase("write " + name):
+                    write_converted(converted, outfile, compressed)
 
-            # If converted is None, assume that the output was written to file directly by the codec
-            if converted != None:
-                # Write the converted output to the appropriate place based on the command line arguments
-                if outfile == None:
-                    if isinstance(converted, (bytes, bytearray)):
-                        sys.stdout.buffer.write(converted)
-                    else:
-                        print(converted)
-                else:
-                    if isinstance(converted, str):
-                        with open(outfile, "w") as file:
-                            file.write(converted)
-                    elif isinstance(converted, (bytes, bytearray)):
-                        with open(outfile, "wb") as file:
-                            file.write(converted)
-                    else:
-                        raise TypeError(
-                            "Expected converted output to be str, bytes, or bytearray. Got '%s'"
-                            % type(converted).__name__
-                        )
+    except expressions.ExpressionError as err:
+        # An expression that fails is an error in the script rather than in the codec
+        if errfile == None:
+            print(str(err), file=sys.stderr)
+        else:
+            with open(errfile, "w") as file:
+                file.write(str(err))
 
-    except Exception:
+        sys.exit(100)
+    except Exception as err:
         out_tb = traceback.format_exc()
 
         # Send the error to wherever the user requested
@@ -589,7 +1170,17 @@ def main():
             with open(errfile, "w") as file:
                 file.write(str(out_tb))
 
-        sys.exit(200)
+        sys.exit(limits.error_exit_code(err, 200))
+    finally:
+        staging.close()
+
+        # Report where the time went, even if a codec failed
+        profiler = profiling.stop()
+        if profiler != None:
+            tessellation_cache = getattr(build_result, "tessellation_cache", None)
+            if tessellation_cache != None:
+                profiler.extra["tessellation"] = tessellation_cache.summary()
+            profiling.write_report(profiler, args.profile, args.metrics_file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+import importlib
+import multiprocessing
+import signal
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# The conversions that forked workers run. Workers inherit them copy-on-write when they
+# are forked, so the shapes never have to be serialized.
+_shared_conversions = None
+
+# Set in forked workers, whose copies of OCCT's thread pools have no threads behind them
+_in_worker = False
+
+
+class ConversionError(Exception):
+    """
+    Raised when a codec fails inside a conversion worker. The message holds the worker's traceback.
+    """
+
+
+def can_fork():
+    """
+    Checks whether worker processes can be forked on this platform.
+    """
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def in_worker():
+    """
+    Checks whether this is a forked worker process. OCCT's own multi-threading should not be
+    used in forked workers, since the threads of any pool started before the fork do not exist.
+    """
+    return _in_worker
+
+
+def _mark_worker():
+    global _in_worker
+    _in_worker = True
+
+    # Workers are forked from processes that may turn SIGTERM into an exception, which the
+    # worker would hand back as the result of a build instead of stopping
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def create_executor(jobs):
+    """
+    Creates a pool of workers. Forked processes are used where the platform supports them,
+    since OCCT holds the GIL for most operations, otherwise threads are used.
+    """
+    if can_fork():
+        return ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_mark_worker,
+        )
+
+    return ThreadPoolExecutor(max_workers=jobs)
+
+
+def stop_executor(executor):
+    """
+    Shuts a pool of workers down without waiting for the builds that are still running.
+    Worker processes are stopped and reaped, so that none of them outlive this process.
+    """
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+
+
+def exit_on_sigterm():
+    """
+    Turns SIGTERM into SystemExit in this process, so that finally blocks get to shut
+    its pool of workers down when it is asked to stop.
+    """
+
+    def stop(signum, frame):
+        raise SystemExit(128 + signum)
+
+    signal.signal(signal.SIGTERM, stop)
+
+
+def _convert(codec_name, outfile, errfile, output_opts, build_result):
+    """
+    Runs a single codec conversion inside a worker. The build result can also be a callable
+    that produces it, such as an expression that has not been evaluated yet.
+    """
+    # Errors producing the build result are not codec errors, so they are passed on as they are
+    if callable(build_result):
+        build_result = build_result()
+
+    try:
+        codec_module = importlib.import_module(codec_name)
+        return codec_module.convert(build_result, outfile, errfile, output_opts)
+    except Exception:
+        raise ConversionError(traceback.format_exc())
+
+
+def _convert_shared(index, errfile, output_opts):
+    """
+    Runs one of the conversions that a forked worker inherited.
+    """
+    codec_name, outfile, build_result = _shared_conversions[index]
+    return _convert(codec_name, outfile, errfile, output_opts, build_result)
+
+
+def run_conversions(conversions, errfile, output_opts, jobs):
+    """
+    Runs a list of (codec module, outfile, build result) conversions concurrently and returns
+    what each codec returned, in the same order as the conversions.
+    """
+    global _shared_conversions
+
+    jobs = max(1, min(jobs, len(conversions)))
+    conversions = [
+        (codec_module.__name__, outfile, build_result)
+        for codec_module, outfile, build_result in conversions
+    ]
+
+    try:
+        with create_executor(jobs) as executor:
+            # Forked workers pick the build results up from the module, threads can just be handed them
+            if can_fork():
+                _shared_conversions = conversions
+                futures = [
+                    executor.submit(_convert_shared, i, errfile, output_opts)
+                    for i in range(len(conversions))
+                ]
+            else:
+                futures = [
+                    executor.submit(
+                        _convert,
+                        codec_name,
+                        outfile,
+                        errfile,
+                        output_opts,
+                        build_result,
+                    )
+                    for codec_name, outfile, build_result in conversions
+                ]
+            return [future.result() for future in futures]
+    finally:
+        _shared_conversions = None
@@ -0,0 +1,113 @@
+import ast
+
+# Parameter types, named the way the getparams output expects them
+_CONSTANT_TYPES = ((bool, "boolean"), ((int, float), "number"), (str, "string"))
+
+
+def _parameter(value_node):
+    """
+    Returns the parameter type and initial value of a value assigned to a variable, or None
+    if CQGI would not treat the assignment as a parameter. Tuples have no type in the output.
+    """
+    # CQGI reads the value of every entry of a tuple, so they all have to be constants
+    if isinstance(value_node, ast.Tuple):
+        if not all(isinstance(entry, ast.Constant) for entry in value_node.elts):
+            return None
+        return None, tuple(entry.value for entry in value_node.elts)
+
+    if not isinstance(value_node, ast.Constant):
+        return None
+
+    for python_type, param_type in _CONSTANT_TYPES:
+        if isinstance(value_node.value, python_type):
+            return param_type, value_node.value
+
+    return None
+
+
+class _DescriptionFinder(ast.NodeVisitor):
+    """
+    Collects the descriptions given to parameters with describe_parameter(var, "description").
+    """
+
+    def __init__(self):
+        self.descriptions = {}
+
+    def visit_Call(self, node):
+        # Like CQGI, calls nested inside other calls are not looked at
+        if (
+            isinstance(node.func, ast.Name)
+            and node.func.id == "describe_parameter"
+            and len(node.args) >= 2
+            and isinstance(node.args[0], ast.Name)
+            and isinstance(node.args[1], ast.Constant)
+        ):
+            self.descriptions[node.args[0].id] = node.args[1].value
+
+
+def extract_parameters(script_str):
+    """
+    Finds the parameters of a CadQuery script the same way cqgi.parse() does, but using only
+    the ast module so that CadQuery and OCCT do not have to be imported.
+    Returns the list of parameter dictionaries that --getparams outputs.
+    Raises SyntaxError if the script is not valid Python.
+    """
+    tree = ast.parse(script_str, "<cqscript>")
+
+    # Only assignments of constants at the top level of the script are parameters
+    found = {}
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+
+        # A tuple assigned to a single name is one parameter, unpacking a tuple gives several
+        target = node.targets[0]
+        if isinstance(target, ast.Name):
+            assignments = [(target, node.value)]
+        elif isinstance(target, (ast.Tuple, ast.List)) and isinstance(
+            node.value, ast.Tuple
+        ):
+            assignments = zip(target.elts, node.value.elts)
+        else:
+            continue
+
+        for name_node, value_node in assignments:
+            # CQGI gives up on the rest of an assignment at the first target that is not a name
+            if not isinstance(name_node, ast.Name):
+                break
+
+            parameter = _parameter(value_node)
+            if parameter != None:
+                found[name_node.id] = parameter
+
+    description_finder = _DescriptionFinder()
+    description_finder.visit(tree)
+
+    params = []
+    for name, (param_type, initial) in found.items():
+        new_dict = {}
+
+        # Tuples are the one kind of parameter that the output gives no type for
+        if param_type != None:
+            new_dict["type"] = param_type
+
+        new_dict["name"] = name
+
+        # If there is a description, save it
+        if description_finder.descriptions.get(name):
+            new_dict["caption"] = description_finder.descriptions[name]
+
+        # If there is an initial value, save it
+        if initial:
+            new_dict["initial"] = initial
+
+        params.append(new_dict)
+
+    return params
+
+
+def check_syntax(script_str):
+    """
+    Compiles a script without running it. Raises SyntaxError if it is not valid Python.
+    """
+    compile(script_str, "<cqscript>", "exec")
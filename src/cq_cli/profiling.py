@@ -0,0 +1,176 @@
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# The resource module is not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# The profiler for the current run, if profiling was requested
+_active = None
+
+
+def peak_rss_mb(who=None):
+    """
+    Returns the peak resident set size of this process (or its children) in megabytes,
+    or None if the platform cannot report it.
+    """
+    if resource == None:
+        return None
+
+    if who == None:
+        who = resource.RUSAGE_SELF
+    max_rss = resource.getrusage(who).ru_maxrss
+
+    # macOS reports bytes, everything else reports kilobytes
+    if sys.platform == "darwin":
+        return max_rss / (1024 * 1024)
+    return max_rss / 1024
+
+
+class Profiler:
+    """
+    Records the wall time, CPU time and memory use of each phase of a run.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.phases = []
+        self.extra = {}
+        self._stack = []
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+        if trace_memory:
+            tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times the code run inside the context as one phase. Nested phases are named after their parents.
+        """
+        if len(self._stack) > 0:
+            name = self._stack[-1] + "/" + name
+        self._stack.append(name)
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            entry = {
+                "phase": name,
+                "wall_seconds": time.perf_counter() - wall_start,
+                "cpu_seconds": time.process_time() - cpu_start,
+                "peak_rss_mb": peak_rss_mb(),
+            }
+            if self.trace_memory:
+                entry["tracemalloc_peak_mb"] = tracemalloc.get_traced_memory()[1] / (
+                    1024 * 1024
+                )
+
+            self.phases.append(entry)
+            self._stack.pop()
+
+    def report(self):
+        """
+        Returns everything that was recorded as a JSON-friendly dictionary.
+        """
+        report = {
+            "phases": self.phases,
+            "total": {
+                "wall_seconds": time.perf_counter() - self._start_wall,
+                "cpu_seconds": time.process_time() - self._start_cpu,
+                "peak_rss_mb": peak_rss_mb(),
+            },
+        }
+
+        # Forked conversion workers are accounted for separately
+        if resource != None:
+            report["total"]["children_peak_rss_mb"] = peak_rss_mb(
+                resource.RUSAGE_CHILDREN
+            )
+
+        report.update(self.extra)
+        return report
+
+    def format_report(self):
+        """
+        Formats the phases as a table for humans to read.
+        """
+        header = ("phase", "wall (s)", "cpu (s)", "peak RSS MB")
+        lines = ["%-48s %10s %10s %12s" % header]
+        entries = self.report()
+        for entry in entries["phases"] + [dict(entries["total"], phase="total")]:
+            rss = entry["peak_rss_mb"]
+            lines.append(
+                "%-48s %10.4f %10.4f %12s"
+                % (
+                    entry["phase"],
+                    entry["wall_seconds"],
+                    entry["cpu_seconds"],
+                    "-" if rss == None else "%.1f" % rss,
+                )
+            )
+        return "\n".join(lines)
+
+
+def start(trace_memory=False):
+    """
+    Turns profiling on for the rest of the run and returns the profiler.
+    """
+    global _active
+    _active = Profiler(trace_memory)
+    return _active
+
+
+def stop():
+    """
+    Turns profiling off again and returns the profiler that was active, if any.
+    """
+    global _active
+    profiler = _active
+    _active = None
+
+    if profiler != None and profiler.trace_memory:
+        tracemalloc.stop()
+
+    return profiler
+
+
+def phase(name):
+    """
+    Times a phase of the run if profiling is on, otherwise does nothing.
+    Work done in other threads overlaps the main thread's phases, so it is not timed separately.
+    """
+    if _active == None or threading.current_thread() != threading.main_thread():
+        return nullcontext()
+    return _active.phase(name)
+
+
+def add_extra(key, value):
+    """
+    Adds extra information to the profiling report if profiling is on.
+    """
+    if _active != None:
+        _active.extra[key] = value
+
+
+def write_report(profiler, print_report, metrics_file):
+    """
+    Prints the profiling table to stderr and/or writes the JSON report to a file.
+    """
+    if print_report:
+        print(profiler.format_report(), file=sys.stderr)
+
+    if metrics_file != None:
+        with open(metrics_file, "w") as file:
+            file.write(json.dumps(profiler.report(), indent=2))
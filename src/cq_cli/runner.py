@@ -0,0 +1,95 @@
+import io
+import os
+import sys
+import threading
+
+# main() swaps the process-wide standard streams, so only one in-process run can happen at a time
+_run_lock = threading.Lock()
+
+
+def _is_within(file_path, dirs):
+    """
+    Checks whether a file lives inside any of the given directories.
+    """
+    file_path = os.path.abspath(file_path)
+    for dir_path in dirs:
+        if file_path.startswith(os.path.join(dir_path, "")):
+            return True
+    return False
+
+
+def forget_user_modules(modules_before, path_before):
+    """
+    Removes the modules that were imported from directories added to sys.path since the
+    snapshot was taken, so that edited user modules are imported fresh next time.
+    Returns the files of the modules that were removed.
+    """
+    added_dirs = [
+        os.path.abspath(p) for p in sys.path if p not in path_before and p != ""
+    ]
+
+    forgotten = []
+    for name in list(sys.modules):
+        if name in modules_before:
+            continue
+
+        module_file = getattr(sys.modules[name], "__file__", None)
+        if module_file != None and _is_within(module_file, added_dirs):
+            forgotten.append(os.path.abspath(module_file))
+            del sys.modules[name]
+
+    return forgotten
+
+
+def run_cli(argv, cwd=None, stdin_data=None):
+    """
+    Runs main() in this process with the given command line arguments, capturing what
+    would have gone to stdout and stderr. Returns a tuple of (exit code, stdout bytes, stderr bytes).
+    """
+    from cq_cli.main import main
+
+    with _run_lock:
+        saved_streams = (sys.stdin, sys.stdout, sys.stderr)
+        saved_cwd = os.getcwd()
+        path_before = list(sys.path)
+        modules_before = set(sys.modules)
+
+        out_buffer = io.BytesIO()
+        err_buffer = io.BytesIO()
+        in_stream = io.TextIOWrapper(io.BytesIO(stdin_data or b""), encoding="utf-8")
+        out_stream = io.TextIOWrapper(out_buffer, encoding="utf-8", write_through=True)
+        err_stream = io.TextIOWrapper(err_buffer, encoding="utf-8", write_through=True)
+        sys.stdin, sys.stdout, sys.stderr = in_stream, out_stream, err_stream
+
+        try:
+            if cwd != None:
+                os.chdir(cwd)
+
+            exit_code = main(argv)
+        except SystemExit as err:
+            exit_code = err.code
+        except Exception as err:
+            print("Unhandled error: " + str(err), file=sys.stderr)
+            exit_code = 1
+        finally:
+            sys.stdin, sys.stdout, sys.stderr = saved_streams
+
+            # Detach so that the captured buffers are not closed along with the wrappers
+            out_stream.flush()
+            err_stream.flush()
+            out_stream.detach()
+            err_stream.detach()
+            os.chdir(saved_cwd)
+
+            # Undo the PYTHONPATH changes and user module imports the script made
+            forget_user_modules(modules_before, path_before)
+            sys.path[:] = path_before
+
+        # Normalize the exit code the same way the interpreter would
+        if exit_code == None:
+            exit_code = 0
+        elif not isinstance(exit_code, int):
+            err_buffer.write((str(exit_code) + "\n").encode("utf-8"))
+            exit_code = 1
+
+        return exit_code, out_buffer.getvalue(), err_buffer.getvalue()
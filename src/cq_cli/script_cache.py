@@ -0,0 +1,53 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# How many parsed scripts to keep around in long-lived processes such as the daemon
+MAX_MODELS = 32
+
+_models = OrderedDict()
+_lock = threading.Lock()
+
+
+def script_key(script_str):
+    """
+    Returns the SHA-256 hex digest of a script, which is what parsed scripts are looked up by.
+    """
+    return hashlib.sha256(script_str.encode("utf-8")).hexdigest()
+
+
+def parse(script_str):
+    """
+    Parses a script with CQGI, reusing the model from an earlier parse of the same script
+    if this process has one. The least recently used models are dropped first.
+    """
+    from cadquery import cqgi
+
+    key = script_key(script_str)
+    with _lock:
+        cq_model = _models.get(key)
+        if cq_model != None:
+            _models.move_to_end(key)
+            return cq_model
+
+    cq_model = cqgi.parse(script_str)
+
+    with _lock:
+        _models[key] = cq_model
+        while len(_models) > MAX_MODELS:
+            _models.popitem(last=False)
+
+    return cq_model
+
+
+def build_params(cq_model, params):
+    """
+    Combines the script defaults with the given parameters. CQGI writes parameter values into
+    the parsed script, so every parameter is set on each build to keep values from an earlier
+    build of a cached model from leaking into this one.
+    """
+    all_params = {}
+    for name, param in cq_model.metadata.parameters.items():
+        all_params[name] = param.default_value
+    all_params.update(params or {})
+    return all_params
@@ -0,0 +1,327 @@
+import os
+import sys
+import json
+import socket
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import BrokenExecutor, Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cq_cli import daemon, limits, parallel, parameters
+
+DEFAULT_ADDRESS = "127.0.0.1:8400"
+
+# How many distinct builds can be waiting or running before requests are turned away
+DEFAULT_QUEUE_LIMIT = 16
+
+# Output files are named after their codec, except where the extension differs
+OUTPUT_EXTENSIONS = {"threejs": "json"}
+
+CONTENT_TYPES = {
+    "gltf": "model/gltf+json",
+    "glb": "model/gltf-binary",
+    "stl": "model/stl",
+    "step": "model/step",
+    "svg": "image/svg+xml",
+    "threejs": "application/json",
+}
+
+# How many times a job is tried when a worker crashes while it is waiting or running
+JOB_ATTEMPTS = 2
+
+# Build errors are the script's fault, bad arguments and codecs the request's
+ERROR_STATUSES = {
+    2: 400,
+    3: 400,
+    100: 422,
+    limits.TIMEOUT_EXIT_CODE: 504,
+    limits.MEMORY_EXIT_CODE: 507,
+}
+
+
+class RequestError(Exception):
+    """
+    Raised when a request is malformed. The message is sent back to the client.
+    """
+
+
+def job_argv(endpoint, request, work_dir, limit_argv=None):
+    """
+    Translates a build or convert request into the command line that main() would be given.
+    """
+    argv = [
+        "--outfile",
+        os.path.join(work_dir, "output"),
+        "--errfile",
+        os.path.join(work_dir, "error.txt"),
+    ]
+
+    if endpoint == "build":
+        argv += ["--validate", "true"]
+    else:
+        codec = request["codec"]
+        argv[1] += "." + OUTPUT_EXTENSIONS.get(codec, codec)
+        argv += ["--codec", codec]
+
+        if request.get("outputopts"):
+            argv += ["--outputopts", request["outputopts"]]
+
+    if request.get("params"):
+        argv += ["--params", json.dumps(request["params"])]
+    if request.get("expression"):
+        argv += ["--expression", request["expression"]]
+
+    return argv + (limit_argv or [])
+
+
+def run_job(endpoint, request, limit_argv=None):
+    """
+    Runs one build or conversion through main(), the same way the command line would.
+    Returns a tuple of (exit code, output bytes, error text).
+    """
+    from cq_cli.runner import run_cli
+
+    with tempfile.TemporaryDirectory(prefix="cq-cli-http-") as work_dir:
+        argv = job_argv(endpoint, request, work_dir, limit_argv)
+        exit_code, out, err = run_cli(
+            argv, stdin_data=request["script"].encode("utf-8")
+        )
+
+        output = b""
+        if os.path.isfile(argv[1]):
+            with open(argv[1], "rb") as file:
+                output = file.read()
+
+        error = err.decode("utf-8", "replace")
+        if os.path.isfile(argv[3]):
+            with open(argv[3], "r") as file:
+                error = file.read()
+
+    return exit_code, output, error
+
+
+def request_key(endpoint, request):
+    """
+    Hashes everything that affects the result of a request, so identical requests can share one build.
+    """
+    fields = [endpoint] + [
+        request.get(name)
+        for name in ("script", "params", "expression", "codec", "outputopts")
+    ]
+    data = json.dumps(fields, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class JobQueue:
+    """
+    Runs builds on a bounded pool of workers. Identical requests that arrive while a build
+    is already waiting or running are given that build's result instead of starting another.
+    """
+
+    def __init__(self, jobs, queue_limit, limit_argv=None):
+        self.jobs = jobs
+        self.queue_limit = queue_limit
+        self.limit_argv = limit_argv
+        self.executor = parallel.create_executor(jobs)
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def submit(self, endpoint, request):
+        """
+        Returns a future for the request, or None if too many builds are already queued.
+        """
+        key = request_key(endpoint, request)
+
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future != None:
+                return future
+
+            if len(self.in_flight) >= self.queue_limit:
+                return None
+
+            future = Future()
+            self.in_flight[key] = future
+
+        future.add_done_callback(lambda f: self._forget(key))
+        self._start(future, endpoint, request, JOB_ATTEMPTS)
+        return future
+
+    def _start(self, future, endpoint, request, attempts):
+        """
+        Hands a job to the workers, replacing the pool first if an earlier job broke it.
+        """
+        executor = self.executor
+        try:
+            job = executor.submit(run_job, endpoint, request, self.limit_argv)
+        except BrokenExecutor:
+            executor = self._replace(executor)
+            job = executor.submit(run_job, endpoint, request, self.limit_argv)
+
+        job.add_done_callback(
+            lambda job: self._finished(
+                future, job, executor, endpoint, request, attempts
+            )
+        )
+
+    def _finished(self, future, job, executor, endpoint, request, attempts):
+        try:
+            future.set_result(job.result())
+        except BrokenExecutor as err:
+            # A worker died and took every job in the pool with it. The job that killed it
+            # cannot be told apart from the others, so each gets another go on a new pool.
+            self._replace(executor)
+            if attempts > 1:
+                try:
+                    self._start(future, endpoint, request, attempts - 1)
+                except Exception as retry_err:
+                    future.set_exception(retry_err)
+            else:
+                future.set_exception(err)
+        except Exception as err:
+            future.set_exception(err)
+
+    def _replace(self, executor):
+        """
+        Swaps a broken pool of workers for a new one, unless that already happened.
+        """
+        with self.lock:
+            if self.executor is executor:
+                self.executor = parallel.create_executor(self.jobs)
+                executor.shutdown(wait=False)
+            return self.executor
+
+    def _forget(self, key):
+        with self.lock:
+            self.in_flight.pop(key, None)
+
+    def shutdown(self):
+        parallel.stop_executor(self.executor)
+
+
+class CQRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the build, convert and getparams endpoints. Every request is a POST with a JSON body.
+    """
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_request(self, endpoint):
+        """
+        Reads and checks the JSON body of a request.
+        """
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError as err:
+            raise RequestError("Request body is not valid JSON: " + str(err))
+
+        if not isinstance(request, dict) or not isinstance(request.get("script"), str):
+            raise RequestError("The request needs a script string")
+
+        if endpoint == "convert" and not isinstance(request.get("codec"), str):
+            raise RequestError("Convert requests need a codec")
+
+        if endpoint == "convert" and request["codec"] not in self.server.codecs:
+            raise RequestError("Unknown codec " + request["codec"])
+
+        return request
+
+    def do_POST(self):
+        endpoint = self.path.strip("/")
+        if endpoint not in ("build", "convert", "getparams"):
+            self.send_json(404, {"error": "Unknown endpoint " + self.path})
+            return
+
+        try:
+            request = self.read_request(endpoint)
+        except RequestError as err:
+            self.send_json(400, {"error": str(err)})
+            return
+
+        # Parameters are found without running the script, so there is no need to queue
+        if endpoint == "getparams":
+            try:
+                self.send_json(200, parameters.extract_parameters(request["script"]))
+            except SyntaxError as err:
+                self.send_json(422, {"exit_code": 100, "error": str(err)})
+            return
+
+        future = self.server.job_queue.submit(endpoint, request)
+        if future == None:
+            self.send_json(503, {"error": "Too many builds are queued, try later"})
+            return
+
+        try:
+            exit_code, output, error = future.result()
+        except Exception as err:
+            # A worker that crashed takes its build with it
+            self.send_json(500, {"error": "Build worker failed: " + str(err)})
+            return
+
+        if exit_code != 0:
+            status = ERROR_STATUSES.get(exit_code, 500)
+            self.send_json(status, {"exit_code": exit_code, "error": error})
+        elif endpoint == "build":
+            self.send_json(200, {"success": True})
+        else:
+            self.send_response(200)
+            self.send_header(
+                "Content-Type",
+                CONTENT_TYPES.get(request["codec"], "application/octet-stream"),
+            )
+            self.send_header("Content-Length", str(len(output)))
+            self.end_headers()
+            self.wfile.write(output)
+
+
+def create_server(address, jobs=1, queue_limit=DEFAULT_QUEUE_LIMIT, limit_argv=None):
+    """
+    Creates an HTTP server bound to a host:port address with its own pool of build workers.
+    """
+    from cq_cli.cqcodecs import loader
+
+    family, bind_address = daemon.parse_address(address)
+    if family != socket.AF_INET:
+        raise ValueError("--http needs a host:port address")
+
+    server = ThreadingHTTPServer(bind_address, CQRequestHandler)
+    server.codecs = [name.replace("cq_codec_", "") for name in loader.load_codecs()]
+    server.job_queue = JobQueue(jobs, queue_limit, limit_argv)
+
+    # Start the workers now, before there are request threads around to be forked
+    server.job_queue.executor.submit(int).result()
+
+    return server
+
+
+def serve(
+    address, jobs=1, queue_limit=DEFAULT_QUEUE_LIMIT, preload=None, limit_argv=None
+):
+    """
+    Loads CadQuery once and then serves HTTP requests until interrupted.
+    """
+    daemon.warm_up(preload)
+
+    # Import main() before the workers are forked from this process
+    import cq_cli.main
+
+    server = create_server(address, jobs, queue_limit, limit_argv)
+    print("cq-cli HTTP server listening on " + address, file=sys.stderr)
+
+    # Being stopped with SIGTERM should take the workers down too
+    parallel.exit_on_sigterm()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.job_queue.shutdown()
@@ -0,0 +1,358 @@
+import os
+import re
+import sys
+import json
+import time
+import socket
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, wait
+from cq_cli import limits, parallel
+
+# How often to look for new job files when there is nothing to do
+POLL_INTERVAL = 0.5
+
+# A job file is renamed as it moves through the spool, so that only one worker ever runs it.
+# Claimed jobs are named after the host and process that claimed them, i.e.
+# part.json.node1-1234.claimed, so that claims left by a spooler that died can be found.
+CLAIMED_SUFFIX = ".claimed"
+DONE_SUFFIX = ".done"
+STATUS_SUFFIX = ".status.json"
+
+# How many times a job is tried when a worker crashes while it is waiting or running
+JOB_ATTEMPTS = 2
+
+
+class JobError(Exception):
+    """
+    Raised when a job file cannot be turned into a conversion.
+    """
+
+
+def pending_jobs(spool_dir):
+    """
+    Lists the job files in the spool directory that have not been claimed yet, sorted by name.
+    """
+    return sorted(
+        os.path.join(spool_dir, name)
+        for name in os.listdir(spool_dir)
+        if name.endswith(".json")
+        and not name.endswith(STATUS_SUFFIX)
+        and not name.startswith(".")
+    )
+
+
+def owner():
+    """
+    Names this spooler in the jobs it claims.
+    """
+    return "%s-%d" % (socket.gethostname(), os.getpid())
+
+
+def claim(job_path):
+    """
+    Claims a job by renaming it. Returns the new path, or None if another worker got there first.
+    """
+    claimed_path = job_path + "." + owner() + CLAIMED_SUFFIX
+    try:
+        os.rename(job_path, claimed_path)
+    except FileNotFoundError:
+        return None
+    return claimed_path
+
+
+def process_alive(pid):
+    """
+    Checks whether a process is still running. Where that cannot be checked, it is assumed to be.
+    """
+    if os.name != "posix":
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def recover_claims(spool_dir):
+    """
+    Puts back the jobs that were claimed by spoolers on this host which are no longer running,
+    so that they are run again. Claims made on other hosts are left alone, since there is no
+    telling from here whether those spoolers are still running them.
+    Returns the paths of the jobs that were put back.
+    """
+    pattern = re.compile(
+        r"^(.+\.json)\."
+        + re.escape(socket.gethostname())
+        + r"-(\d+)"
+        + re.escape(CLAIMED_SUFFIX)
+        + "$"
+    )
+
+    recovered = []
+    for name in sorted(os.listdir(spool_dir)):
+        match = pattern.match(name)
+        if match == None:
+            continue
+
+        # A claim with this process's own id was left by an earlier spooler that had it
+        pid = int(match.group(2))
+        if pid != os.getpid() and process_alive(pid):
+            continue
+
+        job_path = os.path.join(spool_dir, match.group(1))
+        try:
+            os.rename(os.path.join(spool_dir, name), job_path)
+        except OSError:
+            continue
+        recovered.append(job_path)
+
+    return recovered
+
+
+def status_path(job_path):
+    """
+    Works out where the status of a job is written, i.e. jobs/part.json -> jobs/part.status.json.
+    """
+    return job_path[: -len(".json")] + STATUS_SUFFIX
+
+
+def joined(value):
+    """
+    Lets job files give codecs and outfiles either as a list or as a ; separated string.
+    """
+    if isinstance(value, list):
+        return ";".join(value)
+    return value
+
+
+def job_argv(job):
+    """
+    Translates a job into the command line that main() would be given.
+    """
+    if not isinstance(job, dict) or job.get("infile") == None:
+        raise JobError("Job files need an infile")
+
+    if job.get("codec") == None and job.get("outfile") == None:
+        raise JobError("Job files need a codec or an outfile")
+
+    argv = ["--infile", job["infile"]]
+
+    for name in ("codec", "outfile", "errfile"):
+        if job.get(name) != None:
+            argv += ["--" + name, joined(job[name])]
+
+    params = job.get("params")
+    if params != None:
+        argv += ["--params", params if isinstance(params, str) else json.dumps(params)]
+
+    if job.get("outputopts") != None:
+        argv += ["--outputopts", job["outputopts"]]
+
+    expressions = job.get("expression")
+    if isinstance(expressions, str):
+        expressions = [expressions]
+    for expression in expressions or []:
+        argv += ["--expression", expression]
+
+    return argv + limits.limit_arguments(job.get("timeout"), job.get("max_memory"))
+
+
+def write_status(job_path, status):
+    """
+    Writes the status file of a job in one step, so that it is never seen half written.
+    """
+    temp_path = status_path(job_path) + ".tmp"
+    with open(temp_path, "w") as file:
+        file.write(json.dumps(status, indent=2))
+    os.replace(temp_path, status_path(job_path))
+
+
+def run_job(job_path, claimed_path, spool_dir, limit_argv=None):
+    """
+    Runs a claimed job through main(), with paths relative to the spool directory, and
+    records how it went in the job's status file. Limits set in the job file override limit_argv.
+    """
+    from cq_cli.runner import run_cli
+
+    start = time.perf_counter()
+    status = {"job": os.path.basename(job_path)}
+
+    try:
+        with open(claimed_path, "r") as file:
+            argv = (limit_argv or []) + job_argv(json.load(file))
+
+        exit_code, out, err = run_cli(argv, cwd=spool_dir)
+        status.update(
+            exit_code=exit_code,
+            stdout=out.decode("utf-8", "replace"),
+            stderr=err.decode("utf-8", "replace"),
+        )
+    except (ValueError, JobError) as err:
+        status.update(exit_code=2, stdout="", stderr="Job error: " + str(err))
+
+    status["status"] = "success" if status["exit_code"] == 0 else "failed"
+    status["seconds"] = time.perf_counter() - start
+
+    write_status(job_path, status)
+    os.rename(claimed_path, job_path + DONE_SUFFIX)
+
+    return status
+
+
+def crashed(job_path, claimed_path, err, seconds):
+    """
+    Records a job whose worker died, or failed in some other way, before it could record
+    the job itself.
+    """
+    status = {
+        "job": os.path.basename(job_path),
+        "exit_code": 1,
+        "stdout": "",
+        "stderr": "Worker error: " + (str(err) or type(err).__name__),
+        "status": "failed",
+        "seconds": seconds,
+    }
+
+    write_status(job_path, status)
+    os.rename(claimed_path, job_path + DONE_SUFFIX)
+
+    return status
+
+
+def report(status):
+    """
+    Prints a line about a finished job.
+    """
+    print(
+        "%s %s in %.2fs" % (status["job"], status["status"], status["seconds"]),
+        file=sys.stderr,
+    )
+    sys.stderr.flush()
+
+
+def spool(spool_dir, jobs, limit_argv=None):
+    """
+    Claims and runs the job files that appear in the spool directory, up to jobs at a time,
+    until interrupted.
+    """
+    spool_dir = os.path.abspath(spool_dir)
+
+    # Jobs that an earlier spooler on this host claimed but never finished are run again
+    for job_path in recover_claims(spool_dir):
+        print(
+            "%s was claimed but never finished, it will be run again"
+            % os.path.basename(job_path),
+            file=sys.stderr,
+        )
+
+    print("Waiting for jobs in " + spool_dir, file=sys.stderr)
+
+    # Being stopped with SIGTERM should take the workers down too
+    parallel.exit_on_sigterm()
+
+    # The job path, claimed path, start time, tries left and pool of each job that is
+    # waiting or running
+    running = {}
+    executor = parallel.create_executor(jobs)
+
+    # Jobs that could not be claimed for some reason other than another worker having
+    # claimed them first, so that they are only reported once
+    unclaimable = set()
+
+    def start(job_path, claimed_path, attempts):
+        nonlocal executor
+        try:
+            future = executor.submit(
+                run_job, job_path, claimed_path, spool_dir, limit_argv
+            )
+        except BrokenExecutor:
+            executor.shutdown(wait=False)
+            executor = parallel.create_executor(jobs)
+            future = executor.submit(
+                run_job, job_path, claimed_path, spool_dir, limit_argv
+            )
+        running[future] = (
+            job_path,
+            claimed_path,
+            time.perf_counter(),
+            attempts,
+            executor,
+        )
+
+    try:
+        while True:
+            # Only claim jobs for free workers, leaving the rest to other nodes
+            for job_path in pending_jobs(spool_dir):
+                if len(running) >= jobs:
+                    break
+                if job_path in unclaimable:
+                    continue
+
+                try:
+                    claimed_path = claim(job_path)
+                except OSError as err:
+                    unclaimable.add(job_path)
+                    print(
+                        "%s could not be claimed: %s"
+                        % (os.path.basename(job_path), err),
+                        file=sys.stderr,
+                    )
+                    continue
+
+                if claimed_path != None:
+                    start(job_path, claimed_path, JOB_ATTEMPTS)
+
+            if len(running) == 0:
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            done, _ = wait(running, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            retry = []
+            for future in done:
+                job_path, claimed_path, started, attempts, pool = running.pop(future)
+                try:
+                    report(future.result())
+                    continue
+                except BrokenExecutor as err:
+                    # Only the first job to report a broken pool replaces it
+                    if pool is executor:
+                        executor.shutdown(wait=False)
+                        executor = parallel.create_executor(jobs)
+
+                    # A worker died and took every job in the pool with it. The job that
+                    # killed it cannot be told apart from the others, so each gets another go.
+                    if attempts > 1:
+                        retry.append((job_path, claimed_path, attempts - 1))
+                        continue
+                    failure = err
+                except Exception as err:
+                    # Anything else that went wrong, such as a file that could not be read or
+                    # written, only fails this job
+                    failure = err
+
+                try:
+                    report(
+                        crashed(
+                            job_path,
+                            claimed_path,
+                            failure,
+                            time.perf_counter() - started,
+                        )
+                    )
+                except OSError as err:
+                    print(
+                        "%s failed and could not be recorded: %s"
+                        % (os.path.basename(job_path), err),
+                        file=sys.stderr,
+                    )
+
+            for job_path, claimed_path, attempts in retry:
+                start(job_path, claimed_path, attempts)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        parallel.stop_executor(executor)
+
+    return 0
@@ -0,0 +1,193 @@
+import os
+import csv
+import json
+import contextlib
+import traceback
+from concurrent.futures import BrokenExecutor
+from cq_cli import compressors, parallel
+
+# The parsed script that forked sweep workers build from
+_shared_sweep = None
+
+
+def read_sweep_file(sweep_path):
+    """
+    Reads the rows of a parameter sweep. CSV files have a header row naming the parameters,
+    anything else is treated as JSON lines with one parameter dictionary per line.
+    """
+    rows = []
+
+    with open(sweep_path, "r", newline="") as file:
+        if sweep_path.lower().endswith(".csv"):
+            for row in csv.DictReader(file):
+                rows.append(dict(row))
+        else:
+            for line in file:
+                if line.strip() != "":
+                    rows.append(json.loads(line))
+
+    return rows
+
+
+class Sweep:
+    """
+    A script that has been parsed once and can be built and converted for many sets of parameters.
+    """
+
+    def __init__(
+        self, cq_model, base_params, conversions, errfile, output_opts, compress=None
+    ):
+        self.cq_model = cq_model
+        self.base_params = base_params
+        self.conversions = conversions
+        self.errfile = errfile
+        self.output_opts = output_opts
+        self.compress = compress
+
+    def build_params(self, row):
+        """
+        Combines the script defaults, the command line parameters and the row's parameters.
+        Every parameter is set on each build so that values never leak from one row to the next.
+        """
+        params = {}
+        for name, param in self.cq_model.metadata.parameters.items():
+            params[name] = param.default_value
+        params.update(self.base_params)
+        params.update(row)
+        return params
+
+    def run_row(self, index, row):
+        """
+        Builds and converts one row of the sweep, returning its entry for the results manifest.
+        """
+        from cq_cli.main import write_converted
+
+        record = {"index": index, "params": row, "outfiles": [], "success": False}
+
+        try:
+            build_result = self.cq_model.build(self.build_params(row))
+            if not build_result.success:
+                raise build_result.exception
+        except Exception:
+            record["exit_code"] = 100
+            record["error"] = traceback.format_exc()
+            return record
+
+        try:
+            for codec_module, template in self.conversions:
+                outfile = template.format(**dict(row, index=index))
+
+                # Rows often go to a directory per parameter value
+                out_dir = os.path.dirname(outfile)
+                if out_dir != "":
+                    os.makedirs(out_dir, exist_ok=True)
+
+                # Compressed output is exported to a pipe, or a temp file, and compressed from there
+                compress = self.compress or compressors.detect(outfile)
+                with contextlib.ExitStack() as staging:
+                    codec_outfile = outfile
+                    compressed = None
+                    if compress != None:
+                        compressed = staging.enter_context(
+                            compressors.compressed_output(
+                                outfile,
+                                compress,
+                                compressors.streams_output(codec_module),
+                            )
+                        )
+                        codec_outfile = compressed.path
+
+                    converted = codec_module.convert(
+                        build_result, codec_outfile, self.errfile, self.output_opts
+                    )
+                    write_converted(converted, outfile, compressed)
+                record["outfiles"].append(outfile)
+        except Exception:
+            record["exit_code"] = 200
+            record["error"] = traceback.format_exc()
+            return record
+
+        record["success"] = True
+        record["exit_code"] = 0
+        return record
+
+
+def _run_shared_row(index, row):
+    return _shared_sweep.run_row(index, row)
+
+
+def _run_rows(records, rows, indexes, workers):
+    """
+    Runs the given rows on a new pool of workers, filling in their records. Returns the rows
+    that were lost when a worker crashed, leaving out the row that crashed it if it is known.
+    """
+    lost = []
+    with parallel.create_executor(workers) as executor:
+        futures = [(i, executor.submit(_run_shared_row, i, rows[i])) for i in indexes]
+        for i, future in futures:
+            try:
+                records[i] = future.result()
+            except BrokenExecutor as err:
+                lost.append(i)
+                error = str(err) or type(err).__name__
+
+    # A single worker runs its rows in order, so the first row lost is the one it crashed on
+    if workers == 1 and len(lost) > 0:
+        records[lost[0]] = {
+            "index": lost[0],
+            "params": rows[lost[0]],
+            "outfiles": [],
+            "success": False,
+            "exit_code": 1,
+            "error": "Worker error: " + error,
+        }
+        return lost[1:]
+
+    return lost
+
+
+def run_sweep(sweep, rows, jobs):
+    """
+    Runs every row of the sweep, in a pool of forked workers if more than one job was requested.
+    Failed rows are recorded in the returned manifest records rather than stopping the sweep.
+    """
+    global _shared_sweep
+
+    if jobs <= 1 or len(rows) <= 1 or not parallel.can_fork():
+        return [sweep.run_row(i, row) for i, row in enumerate(rows)]
+
+    # The workers get the parsed script from this module when they are forked
+    _shared_sweep = sweep
+    try:
+        records = [None] * len(rows)
+        pending = _run_rows(records, rows, range(len(rows)), min(jobs, len(rows)))
+
+        # The rows lost to a crashed worker are run again. One of them is run on its own,
+        # so that if it crashes its worker it is known to be the culprit, and the rest go
+        # back to the full pool. This repeats until every row has a record.
+        while len(pending) > 0:
+            _run_rows(records, rows, pending[:1], 1)
+            pending = pending[1:]
+            if len(pending) > 0:
+                pending = _run_rows(records, rows, pending, min(jobs, len(pending)))
+
+        return records
+    finally:
+        _shared_sweep = None
+
+
+def write_manifest(records, manifest_path):
+    """
+    Writes the results manifest to a file, or to stdout if no path was given.
+    """
+    manifest = {
+        "succeeded": len([r for r in records if r["success"]]),
+        "failed": len([r for r in records if not r["success"]]),
+        "results": records,
+    }
+
+    if manifest_path == None:
+        print(json.dumps(manifest, indent=2, default=str))
+    else:
+        with open(manifest_path, "w") as file:
+            file.write(json.dumps(manifest, indent=2, default=str))
@@ -0,0 +1,129 @@
+import os
+import sys
+import time
+from cq_cli import runner
+
+# How often to look for changes, and how long the files have to stay unchanged before rebuilding
+POLL_INTERVAL = 0.5
+DEBOUNCE_TIME = 0.3
+
+
+def watched_files(infile, params, module_files):
+    """
+    Lists the files that a rebuild depends on: the script, the parameters file if there is
+    one, and the user modules that the script has imported so far.
+    """
+    files = [os.path.abspath(infile)] + list(module_files)
+
+    if params != None and os.path.isfile(params):
+        files.append(os.path.abspath(params))
+
+    return sorted(set(files))
+
+
+def snapshot(file_paths):
+    """
+    Records the modification time and size of each file. Missing files are recorded as None.
+    """
+    state = {}
+    for file_path in file_paths:
+        try:
+            stat = os.stat(file_path)
+            state[file_path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            state[file_path] = None
+    return state
+
+
+def strip_watch_argument(argv):
+    """
+    Removes the --watch option from a command line.
+    """
+    return [arg for arg in argv if arg != "--watch"]
+
+
+def run_once(argv):
+    """
+    Runs main() in this process, so that CadQuery stays loaded, and reports how the run ended.
+    The user modules the script imported are forgotten afterwards so that edits to them are picked up.
+    Returns the exit code and the files of those modules.
+    """
+    from cq_cli.main import main
+
+    path_before = list(sys.path)
+    modules_before = set(sys.modules)
+    start = time.perf_counter()
+
+    try:
+        exit_code = main(argv)
+    except SystemExit as err:
+        exit_code = err.code
+    except Exception as err:
+        print("Unhandled error: " + str(err), file=sys.stderr)
+        exit_code = 1
+    finally:
+        module_files = runner.forget_user_modules(modules_before, path_before)
+        sys.path[:] = path_before
+
+    if exit_code == None:
+        exit_code = 0
+
+    print(
+        "Rebuilt in %.2fs with exit code %s" % (time.perf_counter() - start, exit_code),
+        file=sys.stderr,
+    )
+    sys.stderr.flush()
+
+    return exit_code, module_files
+
+
+def rebuild(argv, infile, params, module_files):
+    """
+    Runs the conversion and returns the state of the watched files from before it started,
+    so that edits made during the run trigger another one. The files of the user modules
+    it imported are added to module_files.
+    """
+    state = snapshot(watched_files(infile, params, module_files))
+    _, imported = run_once(argv)
+
+    # Modules stay watched once seen, so fixing one that failed to import is still picked up
+    new_files = set(imported) - module_files
+    module_files.update(new_files)
+    state.update(snapshot(new_files))
+
+    return state
+
+
+def watch(argv, infile, params):
+    """
+    Converts the script, then converts it again every time the script or one of the files
+    it depends on changes, until interrupted.
+    """
+    argv = strip_watch_argument(argv)
+
+    # Only the user modules the script actually imports are watched, not its whole directory
+    module_files = set()
+    state = rebuild(argv, infile, params, module_files)
+    print("Watching " + infile + " for changes", file=sys.stderr)
+
+    try:
+        while True:
+            time.sleep(POLL_INTERVAL)
+
+            new_state = snapshot(state)
+            if new_state == state:
+                continue
+
+            # Editors often save in bursts, so wait for the files to settle
+            while True:
+                time.sleep(DEBOUNCE_TIME)
+                settled_state = snapshot(state)
+                if settled_state == new_state:
+                    break
+                new_state = settled_state
+
+            state = rebuild(argv, infile, params, module_files)
+    except KeyboardInterrupt:
+        pass
+
+    return 0
@@ -0,0 +1,88 @@
+import os
+import sys
+import tests.test_helpers as helpers
+
+
+def cached_step_call(cache_dir, out_path, *extra):
+    """
+    Converts file_var.py to STEP with the build cache enabled. The script prints to
+    stdout when it runs, which lets the tests tell cache hits from real builds.
+    """
+    test_file = helpers.get_test_file_location("file_var.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(out_path),
+        "--cache-dir",
+        str(cache_dir),
+    ]
+    command.extend(extra)
+
+    return helpers.cli_call(command)
+
+
+def test_cache_hit_skips_build(tmp_path):
+    """
+    Tests that a second identical build is served from the cache.
+    """
+    cache_dir = tmp_path / "cache"
+    out_path = tmp_path / "out.step"
+
+    out, err, exitcode = cached_step_call(cache_dir, out_path)
+    assert exitcode == 0
+    assert "__file__=" in out.decode()
+    assert len(os.listdir(cache_dir)) == 1
+
+    out, err, exitcode = cached_step_call(cache_dir, out_path)
+    assert exitcode == 0
+    assert "__file__=" not in out.decode()
+    assert out_path.read_text().startswith("ISO-10303-21;")
+
+
+def test_cache_key_includes_params(tmp_path):
+    """
+    Tests that changing the parameters results in a new cache entry.
+    """
+    cache_dir = tmp_path / "cache"
+    test_file = helpers.get_test_file_location("cube_params.py")
+
+    for width in ("1", "2"):
+        command = [
+            sys.executable,
+            "src/cq_cli/main.py",
+            "--codec",
+            "step",
+            "--infile",
+            test_file,
+            "--outfile",
+            str(tmp_path / "out.step"),
+            "--cache-dir",
+            str(cache_dir),
+            "--params",
+            "width:" + width,
+        ]
+        out, err, exitcode = helpers.cli_call(command)
+        assert exitcode == 0
+
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_no_cache(tmp_path):
+    """
+    Tests that --no-cache always runs the build and never stores it.
+    """
+    cache_dir = tmp_path / "cache"
+    out_path = tmp_path / "out.step"
+
+    for _ in range(2):
+        out, err, exitcode = cached_step_call(cache_dir, out_path, "--no-cache")
+        assert exitcode == 0
+        assert "__file__=" in out.decode()
+
+    assert not cache_dir.exists() or len(os.listdir(cache_dir)) == 0
@@ -1,7 +1,13 @@
 import os, sys
+import time
+import signal
+import subprocess
 import pytest
 import tests.test_helpers as helpers
 import json
+import gzip
+import lzma
+from cq_cli import limits
 
 
 def test_no_cli_arguments():
@@ -525,6 +531,274 @@ def test_multiple_outfiles(tmp_path):
     assert exitcode == 0
 
 
+def test_multiple_outfiles_parallel(tmp_path):
+    """
+    Tests that multiple output files can be converted concurrently with --jobs.
+    """
+    test_file = helpers.get_test_file_location("cube.py")
+
+    temp_file_step = tmp_path / "parallel.step"
+    temp_file_stl = tmp_path / "parallel.stl"
+    temp_file_svg = tmp_path / "parallel.svg"
+    temp_paths = f"{temp_file_step};{temp_file_stl};{temp_file_svg}"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step;stl;svg",
+        "--infile",
+        test_file,
+        "--outfile",
+        temp_paths,
+        "--jobs",
+        "3",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert temp_file_step.read_text().startswith("ISO-10303-21;")
+    assert temp_file_stl.read_bytes()[:5] == b"solid"
+    assert "<svg" in temp_file_svg.read_text()
+
+
+def test_results_each(tmp_path):
+    """
+    Tests that every show_object() result can be exported to its own file.
+    """
+    test_file = helpers.get_test_file_location("multi_show_object.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(tmp_path / "{index}_{name}.step"),
+        "--results",
+        "each",
+        "--jobs",
+        "2",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    cube_step = (tmp_path / "0_result0.step").read_text()
+    sphere_step = (tmp_path / "1_result1.step").read_text()
+    assert cube_step.startswith("ISO-10303-21;")
+    assert sphere_step.startswith("ISO-10303-21;")
+    assert "SPHERICAL_SURFACE" not in cube_step
+    assert "SPHERICAL_SURFACE" in sphere_step
+
+
+def test_results_each_unsafe_names(tmp_path):
+    """
+    Tests that results with the same name get files of their own, and that names cannot
+    put files outside the output directory.
+    """
+    script_file = tmp_path / "names.py"
+    script_file.write_text(
+        "\n".join(
+            [
+                "import cadquery as cq",
+                "show_object(cq.Workplane().box(1, 1, 1), options={'name': 'part'})",
+                "show_object(cq.Workplane().box(2, 2, 2), options={'name': 'part'})",
+                "show_object(cq.Workplane().box(3, 3, 3), options={'name': '../escaped'})",
+                "show_object(cq.Workplane().box(4, 4, 4), options={'name': '..'})",
+            ]
+        )
+    )
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        str(script_file),
+        "--outfile",
+        str(out_dir / "{name}.step"),
+        "--results",
+        "each",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert sorted(os.listdir(out_dir)) == [
+        ".._escaped.step",
+        "__.step",
+        "part.step",
+        "part_1.step",
+    ]
+    assert sorted(os.listdir(tmp_path)) == ["names.py", "out"]
+
+
+def test_results_assembly(tmp_path):
+    """
+    Tests that every show_object() result can be combined into one assembly.
+    """
+    test_file = helpers.get_test_file_location("multi_show_object.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        test_file,
+        "--results",
+        "assembly",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    step_str = out.decode()
+    assert "SPHERICAL_SURFACE" in step_str
+    assert "PLANE" in step_str
+
+
+def test_multiple_expressions(tmp_path):
+    """
+    Tests that several expressions can be rendered from one run of a script.
+    """
+    script_file = tmp_path / "parts.py"
+    script_file.write_text(
+        "\n".join(
+            [
+                "import cadquery as cq",
+                "runs = open(__file__ + '.runs', 'a')",
+                "runs.write('run\\n')",
+                "runs.close()",
+                "def part(size):",
+                "    return cq.Workplane().box(size, size, size)",
+            ]
+        )
+    )
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "stl",
+        "--infile",
+        str(script_file),
+        "--outfile",
+        str(tmp_path / "{index}.stl"),
+        "--expression",
+        "part(1)",
+        "--expression",
+        "part(2)",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert (tmp_path / "0.stl").read_bytes() != (tmp_path / "1.stl").read_bytes()
+
+    # The script body only ran once for both expressions
+    assert (tmp_path / "parts.py.runs").read_text() == "run\n"
+
+
+def test_compressed_outfile(tmp_path):
+    """
+    Tests that an outfile ending in .gz is compressed, with the codec detected from the extension before it.
+    """
+    test_file = helpers.get_test_file_location("cube.py")
+    out_path = tmp_path / "cube.step.gz"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(out_path),
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert gzip.decompress(out_path.read_bytes()).startswith(b"ISO-10303-21;")
+
+
+def test_compressed_outfiles_in_parallel(tmp_path):
+    """
+    Tests that outputs exported by parallel workers are compressed, leaving no uncompressed copies.
+    """
+    test_file = helpers.get_test_file_location("cube.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(tmp_path / "cube.step.gz") + ";" + str(tmp_path / "cube.stl.xz"),
+        "--jobs",
+        "2",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert sorted(os.listdir(tmp_path)) == ["cube.step.gz", "cube.stl.xz"]
+    assert gzip.decompress((tmp_path / "cube.step.gz").read_bytes()).startswith(
+        b"ISO-10303-21;"
+    )
+    assert lzma.decompress((tmp_path / "cube.stl.xz").read_bytes())[:5] == b"solid"
+
+
+def test_compressed_gltf_and_glb(tmp_path):
+    """
+    Tests that glTF, which is compressed as it is written, keeps its buffers next to it, and
+    that GLB, which has to be finished before it can be compressed, comes out whole.
+    """
+    test_file = helpers.get_test_file_location("cube.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(tmp_path / "cube.gltf.gz") + ";" + str(tmp_path / "cube.glb.gz"),
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert sorted(os.listdir(tmp_path)) == ["cube.bin", "cube.glb.gz", "cube.gltf.gz"]
+
+    gltf = json.loads(gzip.decompress((tmp_path / "cube.gltf.gz").read_bytes()))
+    assert gltf["buffers"][0]["uri"] == "cube.bin"
+
+    glb = gzip.decompress((tmp_path / "cube.glb.gz").read_bytes())
+    assert glb[:4] == b"glTF"
+    assert int.from_bytes(glb[8:12], "little") == len(glb)
+
+
+def test_compressed_stdout():
+    """
+    Tests that --compress compresses output written to stdout.
+    """
+    test_file = helpers.get_test_file_location("cube.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "stl",
+        "--infile",
+        test_file,
+        "--compress",
+        "xz",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert lzma.decompress(out)[:5] == b"solid"
+
+
 def test_stl_stdout_is_binary_safe():
     """
     Tests that STL output written to stdout is valid binary/text STL content
@@ -629,6 +903,40 @@ def test_validate_invalid_script():
     assert exitcode == 100
 
 
+def test_validate_syntax():
+    """
+    Tests that --validate syntax only checks that the script is valid Python.
+    """
+    # A script that fails to build is still valid Python
+    test_file = helpers.get_test_file_location("impossible_cube.py")
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--validate",
+        "syntax",
+        "--infile",
+        test_file,
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert "validation_success" in out.decode()
+
+    test_file = helpers.get_test_file_location("syntax_error.py")
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--validate",
+        "syntax",
+        "--infile",
+        test_file,
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 100
+    assert "SyntaxError" in err.decode()
+
+
 def test_outputopts_quoted_string(tmp_path):
     """
     Tests that quoted string output options are stored without surrounding quotes.
@@ -1104,3 +1412,235 @@ def test_multi_show_object_produces_output():
 
     assert exitcode == 0
     assert "ISO-10303-21;" in out.decode()
+
+
+def test_metrics_file(tmp_path):
+    """
+    Tests that --metrics-file writes a JSON report with a timing entry for each phase.
+    """
+    test_file = helpers.get_test_file_location("cube.py")
+    metrics_path = tmp_path / "metrics.json"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step;stl",
+        "--infile",
+        test_file,
+        "--outfile",
+        f"{tmp_path / 'out.step'};{tmp_path / 'out.stl'}",
+        "--metrics-file",
+        str(metrics_path),
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+
+    metrics = json.loads(metrics_path.read_text())
+    phases = [p["phase"] for p in metrics["phases"]]
+    assert "parse" in phases
+    assert "build" in phases
+    assert any(p.startswith("export step") for p in phases)
+    assert any(p.startswith("export stl") for p in phases)
+    for entry in metrics["phases"]:
+        assert entry["wall_seconds"] >= 0
+        assert entry["cpu_seconds"] >= 0
+    assert "tessellation" in metrics
+
+
+def test_profile_prints_report(tmp_path):
+    """
+    Tests that --profile prints the phase table to stderr without disturbing stdout output.
+    """
+    test_file = helpers.get_test_file_location("cube.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        test_file,
+        "--profile",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert "ISO-10303-21;" in out.decode()
+    assert "wall (s)" in err.decode()
+
+
+def test_timeout(tmp_path):
+    """
+    Tests that a conversion that runs past --timeout is stopped with its own exit code.
+    """
+    script_file = tmp_path / "slow.py"
+    script_file.write_text(
+        "\n".join(
+            [
+                "import time",
+                "import cadquery as cq",
+                "time.sleep(120)",
+                "show_object(cq.Workplane().box(1, 1, 1))",
+            ]
+        )
+    )
+    errfile = tmp_path / "error.txt"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        str(script_file),
+        "--errfile",
+        str(errfile),
+        "--timeout",
+        "20",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 150
+    assert "Timeout error" in errfile.read_text()
+
+
+def test_max_memory(tmp_path):
+    """
+    Tests that a conversion that allocates past --max-memory is stopped with its own exit code.
+    """
+    pytest.importorskip("resource")
+
+    script_file = tmp_path / "greedy.py"
+    script_file.write_text(
+        "\n".join(
+            [
+                "import time",
+                "import cadquery as cq",
+                "# Memory is taken a bit at a time, so the run is stopped soon after the limit",
+                "chunks = []",
+                "for _ in range(64):",
+                "    chunks.append(bytearray(16 * 1024 ** 2))",
+                "    time.sleep(0.02)",
+                "show_object(cq.Workplane().box(1, 1, 1))",
+            ]
+        )
+    )
+    errfile = tmp_path / "error.txt"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        str(script_file),
+        "--errfile",
+        str(errfile),
+        "--max-memory",
+        "700",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 151
+    assert "Memory error" in errfile.read_text()
+
+
+def test_max_memory_crash(tmp_path):
+    """
+    Tests that a run with --max-memory that crashes is not reported as running out of memory.
+    """
+    pytest.importorskip("resource")
+
+    script_file = tmp_path / "crash.py"
+    script_file.write_text("import os, signal\nos.kill(os.getpid(), signal.SIGSEGV)\n")
+    errfile = tmp_path / "error.txt"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        str(script_file),
+        "--errfile",
+        str(errfile),
+        "--max-memory",
+        "2000",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 128 + signal.SIGSEGV
+    assert "Memory error" not in errfile.read_text()
+
+
+def test_limited_run_interrupted(tmp_path):
+    """
+    Tests that interrupting a run with --timeout stops its child process too.
+    """
+    if not os.path.isdir("/proc/self"):
+        pytest.skip("Processes cannot be listed from /proc on this platform")
+
+    script_file = tmp_path / "slow.py"
+    script_file.write_text("import time\ntime.sleep(120)\n")
+
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "src/cq_cli/main.py",
+            "--codec",
+            "step",
+            "--infile",
+            str(script_file),
+            "--timeout",
+            "30",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    # Wait for the child to be started before interrupting
+    children = []
+    for _ in range(600):
+        children = helpers.child_pids(proc.pid)
+        if children:
+            break
+        time.sleep(0.1)
+
+    proc.send_signal(signal.SIGINT)
+    out, err = proc.communicate()
+
+    assert len(children) == 1
+    assert proc.returncode == 130
+    assert b"Traceback" not in err
+    assert not os.path.exists("/proc/%d" % children[0])
+
+
+def test_max_memory_counts_resident_memory(tmp_path):
+    """
+    Tests that --max-memory limits the memory in use rather than the address space, which
+    loading CadQuery alone would take most of.
+    """
+    if not limits.can_watch_memory():
+        pytest.skip("The memory of the child cannot be watched on this platform")
+
+    test_file = helpers.get_test_file_location("cube.py")
+    outfile = tmp_path / "cube.step"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(outfile),
+        "--max-memory",
+        "800",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert outfile.read_text().startswith("ISO-10303-21;")
@@ -0,0 +1,46 @@
+import sys
+import subprocess
+import tests.test_helpers as helpers
+
+# Number of cq-cli processes to run at the same time
+CONCURRENT_RUNS = 8
+
+
+def stl_command(file_name):
+    return [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "stl",
+        "--infile",
+        helpers.get_test_file_location(file_name),
+    ]
+
+
+def test_concurrent_runs_do_not_share_temp_files():
+    """
+    Runs many conversions of different models at once and makes sure each process
+    gets its own output back rather than another process's temp file.
+    """
+    file_names = ["cube.py", "sphere.py"]
+
+    # Reference output for each model, produced one at a time
+    expected = {}
+    for file_name in file_names:
+        out, err, exitcode = helpers.cli_call(stl_command(file_name))
+        assert exitcode == 0
+        expected[file_name] = out
+
+    # Start all of the runs before collecting any of their output
+    runs = []
+    for i in range(CONCURRENT_RUNS):
+        file_name = file_names[i % len(file_names)]
+        proc = subprocess.Popen(
+            stl_command(file_name), stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        runs.append((file_name, proc))
+
+    for file_name, proc in runs:
+        out, err = proc.communicate()
+        assert proc.returncode == 0
+        assert out == expected[file_name]
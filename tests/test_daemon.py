@@ -0,0 +1,221 @@
+import os
+import sys
+import time
+import socket
+import threading
+import subprocess
+import pytest
+import tests.test_helpers as helpers
+from cq_cli import daemon
+
+
+def start_daemon(tmp_path, extra_args=[]):
+    """
+    Starts a cq-cli daemon on a private socket and stops it after the test.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        pytest.skip("Unix domain sockets are not available on this platform")
+
+    socket_path = str(tmp_path / "cq-cli.sock")
+    proc = subprocess.Popen(
+        [sys.executable, "src/cq_cli/main.py", "--serve", socket_path] + extra_args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    # Importing CadQuery can take a while, so give the daemon some time to come up
+    for _ in range(600):
+        if os.path.exists(socket_path):
+            break
+        time.sleep(0.1)
+
+    yield socket_path
+
+    proc.terminate()
+    proc.wait()
+
+
+@pytest.fixture
+def daemon_socket(tmp_path):
+    yield from start_daemon(tmp_path)
+
+
+@pytest.fixture
+def prefork_socket(tmp_path):
+    if not hasattr(os, "fork"):
+        pytest.skip("fork is not available on this platform")
+
+    yield from start_daemon(tmp_path, ["--prefork", "--preload", "json"])
+
+
+def test_daemon_step_output(daemon_socket):
+    """
+    Tests that a conversion forwarded to the daemon produces the same output as an in-process run.
+    """
+    test_file = helpers.get_test_file_location("cube.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--connect",
+        daemon_socket,
+        "--codec",
+        "step",
+        "--infile",
+        test_file,
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert "ISO-10303-21;" in out.decode()
+
+
+def test_daemon_relays_exit_code(daemon_socket):
+    """
+    Tests that build errors inside the daemon are passed back to the client.
+    """
+    test_file = helpers.get_test_file_location("impossible_cube.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--connect",
+        daemon_socket,
+        "--codec",
+        "step",
+        "--infile",
+        test_file,
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 100
+
+
+def test_connect_falls_back_without_daemon(tmp_path):
+    """
+    Tests that the client runs the conversion itself when no daemon is listening.
+    """
+    test_file = helpers.get_test_file_location("cube.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--connect",
+        str(tmp_path / "missing.sock"),
+        "--codec",
+        "step",
+        "--infile",
+        test_file,
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert "ISO-10303-21;" in out.decode()
+
+
+def test_connect_falls_back_with_stdin(tmp_path):
+    """
+    Tests that a script piped in is still converted locally when the daemon hangs up
+    after the script has been sent to it.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        pytest.skip("Unix domain sockets are not available on this platform")
+
+    # A daemon that reads the request and closes the connection without answering
+    socket_path = str(tmp_path / "closing.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(1)
+
+    def hang_up():
+        conn, _ = listener.accept()
+        with conn:
+            conn.makefile("rb").readline()
+
+    thread = threading.Thread(target=hang_up)
+    thread.start()
+
+    with open(helpers.get_test_file_location("cube.py"), "rb") as file:
+        script = file.read()
+
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "src/cq_cli/main.py",
+            "--connect",
+            socket_path,
+            "--codec",
+            "step",
+        ],
+        input=script,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    thread.join()
+    listener.close()
+
+    assert proc.returncode == 0, proc.stderr.decode()
+    assert "ISO-10303-21;" in proc.stdout.decode()
+
+
+def test_prefork_daemon(prefork_socket):
+    """
+    Tests that a prefork daemon keeps serving conversions after one of its children fails.
+    """
+    for test_name, expected_code in [
+        ("impossible_cube.py", 100),
+        ("cube.py", 0),
+        ("cube.py", 0),
+    ]:
+        command = [
+            sys.executable,
+            "src/cq_cli/main.py",
+            "--connect",
+            prefork_socket,
+            "--codec",
+            "step",
+            "--infile",
+            helpers.get_test_file_location(test_name),
+        ]
+        out, err, exitcode = helpers.cli_call(command)
+
+        assert exitcode == expected_code
+        if expected_code == 0:
+            assert "ISO-10303-21;" in out.decode()
+
+
+def test_serve_keeps_other_files(tmp_path):
+    """
+    Tests that the daemon will not start over a file that is not a socket.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        pytest.skip("Unix domain sockets are not available on this platform")
+
+    path = tmp_path / "precious.txt"
+    path.write_text("keep me")
+
+    with pytest.raises(ValueError):
+        daemon.create_server(str(path))
+
+    assert path.read_text() == "keep me"
+
+
+def test_serve_replaces_only_stale_sockets(tmp_path):
+    """
+    Tests that the socket of a running daemon is left alone, and that of a stopped one is reused.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        pytest.skip("Unix domain sockets are not available on this platform")
+
+    socket_path = str(tmp_path / "cq-cli.sock")
+
+    server = daemon.create_server(socket_path)
+    try:
+        with pytest.raises(ValueError):
+            daemon.create_server(socket_path)
+    finally:
+        server.server_close()
+
+    # The socket file is left behind, as it would be by a daemon that was killed
+    server = daemon.create_server(socket_path)
+    server.server_close()
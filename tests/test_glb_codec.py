@@ -1,4 +1,6 @@
 import sys
+import json
+import struct
 import tests.test_helpers as helpers
 
 
@@ -47,9 +49,9 @@ def test_glb_codec_to_file(tmp_path):
     assert content[:4] == b"glTF"
 
 
-def test_glb_codec_non_assembly_exits_with_error():
+def test_glb_codec_non_assembly():
     """
-    Tests that the GLB codec on a non-assembly shape exits non-zero (raises ValueError).
+    Tests that the GLB codec wraps a non-assembly shape in an assembly.
     """
     test_file = helpers.get_test_file_location("cube.py")
 
@@ -63,4 +65,83 @@ def test_glb_codec_non_assembly_exits_with_error():
     ]
     out, err, exitcode = helpers.cli_call(command)
 
-    assert exitcode != 0
+    assert exitcode == 0
+    assert out[:4] == b"glTF"
+
+
+def test_glb_codec_multiple_results(tmp_path):
+    """
+    Tests that the GLB codec exports every show_object() result of a script.
+    """
+    test_file = helpers.get_test_file_location("multi_show_object.py")
+    out_path = tmp_path / "multi.glb"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "glb",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(out_path),
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+
+    # The JSON chunk of a GLB file starts after the 12 byte header and 8 byte chunk header
+    content = out_path.read_bytes()
+    json_length = struct.unpack("<I", content[12:16])[0]
+    gltf = json.loads(content[20 : 20 + json_length])
+    assert len(gltf["meshes"]) >= 2
+
+
+def test_glb_codec_to_file_with_other_extension(tmp_path):
+    """
+    Tests that the GLB codec writes binary glTF straight to the outfile even when
+    the file extension is not .glb.
+    """
+    test_file = helpers.get_test_file_location("cube_assy.py")
+    out_path = tmp_path / "out.bin"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "glb",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(out_path),
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert out_path.read_bytes()[:4] == b"glTF"
+
+
+def test_glb_codec_lods(tmp_path):
+    """
+    Tests that the GLB codec can write several levels of detail in one run.
+    """
+    test_file = helpers.get_test_file_location("cube_assy.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "glb",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(tmp_path / "assy.glb"),
+        "--outputopts",
+        "lods:(0.01,0.5);lodAngularDeflections:(0.05,0.5)",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    for i in range(2):
+        assert (tmp_path / f"assy.lod{i}.glb").read_bytes()[:4] == b"glTF"
+    assert not (tmp_path / "assy.glb").exists()
@@ -1,4 +1,5 @@
 import sys
+import json
 import pytest
 import tests.test_helpers as helpers
 
@@ -39,7 +40,6 @@ def test_gltf_codec_is_valid_json():
     out, err, exitcode = helpers.cli_call(command)
 
     assert exitcode == 0
-    import json
 
     data = json.loads(out.decode())
     assert "accessors" in data
@@ -65,15 +65,14 @@ def test_gltf_codec_to_file(tmp_path):
     out, err, exitcode = helpers.cli_call(command)
 
     assert exitcode == 0
-    import json
 
     data = json.loads(out_path.read_text())
     assert "accessors" in data
 
 
-def test_gltf_codec_non_assembly_exits_with_error():
+def test_gltf_codec_non_assembly():
     """
-    Tests that the GLTF codec on a non-assembly shape exits non-zero (raises ValueError).
+    Tests that the GLTF codec wraps a non-assembly shape in an assembly.
     """
     test_file = helpers.get_test_file_location("cube.py")
 
@@ -87,4 +86,35 @@ def test_gltf_codec_non_assembly_exits_with_error():
     ]
     out, err, exitcode = helpers.cli_call(command)
 
-    assert exitcode != 0
+    assert exitcode == 0
+
+    gltf = json.loads(out.decode())
+    assert len(gltf["meshes"]) > 0
+
+
+def test_gltf_codec_shares_tessellation(tmp_path):
+    """
+    Tests that the glTF codecs mesh through the same cache as the other mesh codecs.
+    """
+    test_file = helpers.get_test_file_location("sphere.py")
+    metrics_path = tmp_path / "metrics.json"
+    outfiles = [tmp_path / name for name in ("out.stl", "out.glb", "out.gltf")]
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "stl;glb;gltf;threejs",
+        "--infile",
+        test_file,
+        "--outfile",
+        ";".join(str(o) for o in outfiles + [tmp_path / "out.json"]),
+        "--metrics-file",
+        str(metrics_path),
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+    assert exitcode == 0
+
+    mesh = json.loads(metrics_path.read_text())["tessellation"]["mesh"]
+    assert mesh["requests"] == 4
+    assert mesh["hits"] >= 2
@@ -28,3 +28,19 @@ def params_list_to_dict(param_list):
     for entry in param_list:
         d[entry["name"]] = entry
     return d
+
+
+def child_pids(pid):
+    """
+    Lists the processes whose parent is the given process.
+    """
+    pids = []
+    for name in os.listdir("/proc"):
+        try:
+            with open(os.path.join("/proc", name, "stat"), "r") as file:
+                fields = file.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == pid:
+            pids.append(int(name))
+    return pids
@@ -0,0 +1,55 @@
+import sys
+import subprocess
+
+
+def test_load_codecs_does_not_import_codecs():
+    """
+    Tests that discovering the codecs does not import them, and that looking one up does.
+    """
+    script = "\n".join(
+        [
+            "import sys",
+            "from cq_cli.cqcodecs import loader",
+            "codecs = loader.load_codecs()",
+            "assert 'cq_codec_step' in codecs",
+            "assert 'cq_codec_stl' in codecs",
+            "assert not any(m.startswith('cq_cli.cqcodecs.cq_codec_') for m in sys.modules)",
+            "assert hasattr(codecs['cq_codec_step'], 'convert')",
+            "assert 'cq_cli.cqcodecs.cq_codec_step' in sys.modules",
+            "assert 'cq_cli.cqcodecs.cq_codec_stl' not in sys.modules",
+        ]
+    )
+
+    proc = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd="src",
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    assert proc.returncode == 0, proc.stderr.decode()
+
+
+def test_getparams_does_not_import_cadquery():
+    """
+    Tests that finding the parameters of a script does not load CadQuery or OCCT.
+    """
+    script = "\n".join(
+        [
+            "import sys",
+            "from cq_cli.main import main",
+            "main(['--getparams', 'true', '--infile', '../tests/testdata/cube_params.py'])",
+            "assert 'cadquery' not in sys.modules",
+            "assert 'OCP' not in sys.modules",
+        ]
+    )
+
+    proc = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd="src",
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    assert proc.returncode == 0, proc.stderr.decode()
+    assert '"name": "width"' in proc.stdout.decode()
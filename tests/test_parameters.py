@@ -0,0 +1,80 @@
+from cadquery import cqgi
+from cq_cli import parameters
+
+# Covers the kinds of assignments that CQGI does and does not treat as parameters
+SCRIPT = """
+import cadquery as cq
+
+width = 10
+height = 2.5
+name = "part"
+hollow = True
+solid = False
+empty = ""
+zero = 0
+size = (1, 2, 3)
+mixed = (1, "a", None)
+nested = (1, (2, 3))
+a, b = 4, "five"
+[c, d] = 6, (7, 8)
+e, f = width, 9
+g = h = 11
+nothing = None
+negative = -1
+other = width
+result = cq.Workplane().box(width, height, 1)
+width = 12
+
+
+def inner():
+    hidden = 1
+    describe_parameter(hidden, "Not a parameter")
+
+
+describe_parameter(width, "The width")
+describe_parameter(size, "The size", valid_values=[1, 2])
+describe_parameter(missing, "Not assigned")
+show_object(result)
+"""
+
+
+def cqgi_parameters(script_str):
+    """
+    Turns the parameters that cqgi.parse() finds into getparams output, the way cq-cli
+    did before it found them itself.
+    """
+    types = {
+        "NumberParameterType": "number",
+        "StringParameterType": "string",
+        "BooleanParameterType": "boolean",
+    }
+
+    params = []
+    for param in cqgi.parse(script_str).metadata.parameters.values():
+        new_dict = {}
+        if param.varType.__name__ in types:
+            new_dict["type"] = types[param.varType.__name__]
+        new_dict["name"] = param.name
+        if param.desc:
+            new_dict["caption"] = param.desc
+        if param.default_value:
+            new_dict["initial"] = param.default_value
+        params.append(new_dict)
+
+    return params
+
+
+def test_extract_parameters_matches_cqgi():
+    """
+    Tests that parameters are found the same way as cqgi.parse() finds them.
+    """
+    assert parameters.extract_parameters(SCRIPT) == cqgi_parameters(SCRIPT)
+
+
+def test_extract_tuple_parameter():
+    """
+    Tests that a tuple assigned to a single name is one parameter with no type.
+    """
+    params = parameters.extract_parameters("size = (1, 2, 3)")
+
+    assert params == [{"name": "size", "initial": (1, 2, 3)}]
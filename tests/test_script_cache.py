@@ -0,0 +1,32 @@
+from cq_cli import script_cache
+from cq_cli.runner import run_cli
+import tests.test_helpers as helpers
+
+
+def test_parsed_script_is_reused():
+    """
+    Tests that parsing the same script again gives back the model from the first parse.
+    """
+    script = "width = 1\nshow_object(cq.Workplane().box(width, 1, 1))"
+
+    assert script_cache.parse(script) is script_cache.parse(script)
+    assert script_cache.parse(script) is not script_cache.parse(script + "\n")
+
+
+def test_cached_model_resets_params():
+    """
+    Tests that parameters from an earlier build of a cached model do not leak into the next one.
+    """
+    test_file = helpers.get_test_file_location("cube_params.py")
+    command = ["--codec", "stl", "--infile", test_file]
+
+    exit_code, default_out, err = run_cli(command)
+    assert exit_code == 0
+
+    exit_code, wide_out, err = run_cli(command + ["--params", "width:10"])
+    assert exit_code == 0
+    assert wide_out != default_out
+
+    exit_code, out, err = run_cli(command)
+    assert exit_code == 0
+    assert out == default_out
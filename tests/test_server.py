@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import socket
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import tests.test_helpers as helpers
+
+
+def start_server(extra_args):
+    """
+    Starts the HTTP server on a free localhost port and waits for it to accept connections.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    proc = subprocess.Popen(
+        [sys.executable, "src/cq_cli/main.py", "--http", "127.0.0.1:%d" % port]
+        + extra_args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    # Importing CadQuery can take a while, so give the server some time to come up
+    for _ in range(600):
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+
+    return proc, "http://127.0.0.1:%d" % port
+
+
+def stop_server(proc):
+    """
+    Stops the server with SIGTERM, the way a service manager would, which also stops its workers.
+    """
+    proc.terminate()
+    proc.wait()
+
+
+@pytest.fixture
+def server_url():
+    proc, url = start_server(["--jobs", "2"])
+    yield url
+    stop_server(proc)
+
+
+def post(url, body):
+    """
+    Posts a JSON request and returns the status and the response body.
+    """
+    request = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"))
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as err:
+        return err.code, err.read()
+
+
+def slow_script(runs_file):
+    """
+    A script that takes a moment to build and records every time it is run.
+    """
+    return "\n".join(
+        [
+            "import time",
+            "import cadquery as cq",
+            "size = 1",
+            "with open(%r, 'a') as file:" % str(runs_file),
+            "    file.write('run\\n')",
+            "time.sleep(2)",
+            "show_object(cq.Workplane().box(size, size, size))",
+        ]
+    )
+
+
+def test_http_convert(server_url):
+    """
+    Tests that the convert endpoint returns the converted model.
+    """
+    script = "import cadquery as cq\nshow_object(cq.Workplane().box(1, 2, 3))"
+    status, body = post(server_url + "/convert", {"script": script, "codec": "step"})
+
+    assert status == 200
+    assert "ISO-10303-21;" in body.decode()
+
+
+def test_http_build_error(server_url):
+    """
+    Tests that build errors are reported with the traceback.
+    """
+    script = "import cadquery as cq\nshow_object(cq.Workplane().box(0, 0, 0))"
+    status, body = post(server_url + "/build", {"script": script})
+
+    assert status == 422
+    assert json.loads(body)["exit_code"] == 100
+
+
+def test_http_survives_crashed_worker(server_url):
+    """
+    Tests that a script which kills its worker fails on its own, and the server keeps building.
+    """
+    script = "import os\nos._exit(3)"
+    status, body = post(server_url + "/build", {"script": script})
+
+    assert status == 500
+    assert "Build worker failed" in json.loads(body)["error"]
+
+    script = "import cadquery as cq\nshow_object(cq.Workplane().box(1, 2, 3))"
+    status, body = post(server_url + "/convert", {"script": script, "codec": "step"})
+
+    assert status == 200
+    assert "ISO-10303-21;" in body.decode()
+
+
+def test_http_getparams(server_url):
+    """
+    Tests that parameters are reported without building the script.
+    """
+    status, body = post(server_url + "/getparams", {"script": "width = 2\n"})
+
+    assert status == 200
+    assert json.loads(body) == [{"type": "number", "name": "width", "initial": 2}]
+
+
+def test_http_coalesces_identical_requests(server_url, tmp_path):
+    """
+    Tests that identical requests made at the same time share a single build.
+    """
+    runs_file = tmp_path / "runs.txt"
+    body = {"script": slow_script(runs_file), "codec": "stl", "params": {"size": 2}}
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(
+            executor.map(lambda _: post(server_url + "/convert", body), range(4))
+        )
+
+    assert [status for status, _ in results] == [200] * 4
+    assert len(set(output for _, output in results)) == 1
+    assert runs_file.read_text().count("run") == 1
+
+
+def test_http_queue_limit(tmp_path):
+    """
+    Tests that requests are turned away once the queue is full.
+    """
+    proc, url = start_server(["--jobs", "1", "--queue-limit", "1"])
+
+    try:
+        bodies = [
+            {"script": slow_script(tmp_path / "runs.txt"), "params": {"size": size}}
+            for size in (1, 2)
+        ]
+
+        with ThreadPoolExecutor(2) as executor:
+            first = executor.submit(post, url + "/build", bodies[0])
+            time.sleep(0.5)
+            second = executor.submit(post, url + "/build", bodies[1])
+
+            assert second.result()[0] == 503
+            assert first.result()[0] == 200
+    finally:
+        stop_server(proc)
+
+
+def test_http_stop_reaps_workers():
+    """
+    Tests that stopping the server with SIGTERM stops its pool of workers too.
+    """
+    if not os.path.isdir("/proc/self"):
+        pytest.skip("Processes cannot be listed from /proc on this platform")
+
+    proc, url = start_server(["--jobs", "2"])
+
+    # The server accepts connections before its workers have all been started
+    post(url + "/build", {"script": "size = 1"})
+    workers = helpers.child_pids(proc.pid)
+    stop_server(proc)
+
+    assert len(workers) == 2
+    for pid in workers:
+        assert not os.path.exists("/proc/%d" % pid)
+
+
+def test_http_memory_limit():
+    """
+    Tests that a build stopped for going over --max-memory is reported as a 507.
+    """
+    pytest.importorskip("resource")
+
+    proc, url = start_server(["--jobs", "1", "--max-memory", "700"])
+
+    # Memory is taken a bit at a time, so that the build is stopped not long after the limit
+    script = "\n".join(
+        [
+            "import time",
+            "chunks = []",
+            "for _ in range(64):",
+            "    chunks.append(bytearray(16 * 1024 ** 2))",
+            "    time.sleep(0.02)",
+        ]
+    )
+
+    try:
+        status, body = post(url + "/build", {"script": script})
+    finally:
+        stop_server(proc)
+
+    assert status == 507
+    assert json.loads(body)["exit_code"] == 151
@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import socket
+import subprocess
+import pytest
+import tests.test_helpers as helpers
+
+
+def submit_job(spool_dir, name, job):
+    """
+    Adds a job to the spool the way a queue should, by renaming a finished file into place.
+    """
+    temp_path = os.path.join(spool_dir, "." + name)
+    with open(temp_path, "w") as file:
+        file.write(json.dumps(job))
+    os.rename(temp_path, os.path.join(spool_dir, name))
+
+
+def wait_for_status(spool_dir, name):
+    """
+    Waits for the status file of a job to be written and returns its contents.
+    """
+    status_file = os.path.join(spool_dir, name.replace(".json", ".status.json"))
+
+    # Importing CadQuery can take a while, so give the first job some time
+    for _ in range(600):
+        if os.path.exists(status_file):
+            with open(status_file, "r") as file:
+                return json.load(file)
+        time.sleep(0.1)
+
+    return None
+
+
+def test_spool_dir(tmp_path):
+    """
+    Tests that job files dropped into the spool directory are claimed and run.
+    """
+    spool_dir = str(tmp_path)
+
+    submit_job(
+        spool_dir,
+        "cube.json",
+        {
+            "infile": helpers.get_test_file_location("cube.py"),
+            "codec": ["step", "stl"],
+            "outfile": ["cube.step", "cube.stl"],
+        },
+    )
+    submit_job(
+        spool_dir,
+        "impossible.json",
+        {
+            "infile": helpers.get_test_file_location("impossible_cube.py"),
+            "codec": "step",
+            "outfile": "impossible.step",
+        },
+    )
+
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "src/cq_cli/main.py",
+            "--spool-dir",
+            spool_dir,
+            "--jobs",
+            "2",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    try:
+        status = wait_for_status(spool_dir, "cube.json")
+        assert status["status"] == "success"
+        assert status["exit_code"] == 0
+        with open(os.path.join(spool_dir, "cube.step"), "r") as file:
+            assert "ISO-10303-21;" in file.read()
+        assert os.path.exists(os.path.join(spool_dir, "cube.stl"))
+        assert os.path.exists(os.path.join(spool_dir, "cube.json.done"))
+
+        status = wait_for_status(spool_dir, "impossible.json")
+        assert status["status"] == "failed"
+        assert status["exit_code"] == 100
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def test_spool_crashed_worker(tmp_path):
+    """
+    Tests that a job which kills its worker is recorded as failed, and later jobs still run.
+    """
+    spool_dir = str(tmp_path)
+
+    with open(os.path.join(spool_dir, "crash.py"), "w") as file:
+        file.write("import os\nos._exit(3)\n")
+
+    submit_job(spool_dir, "a.json", {"infile": "crash.py", "codec": "step"})
+
+    proc = subprocess.Popen(
+        [sys.executable, "src/cq_cli/main.py", "--spool-dir", spool_dir],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    try:
+        status = wait_for_status(spool_dir, "a.json")
+        assert status["status"] == "failed"
+        assert os.path.exists(os.path.join(spool_dir, "a.json.done"))
+
+        submit_job(
+            spool_dir,
+            "b.json",
+            {
+                "infile": helpers.get_test_file_location("cube.py"),
+                "codec": "step",
+                "outfile": "b.step",
+            },
+        )
+        status = wait_for_status(spool_dir, "b.json")
+        assert status["status"] == "success"
+        assert proc.poll() == None
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def test_spool_recovers_stale_claims(tmp_path):
+    """
+    Tests that a job claimed by a spooler that is no longer running is run again.
+    """
+    spool_dir = str(tmp_path)
+
+    # A process that has already exited stands in for a spooler that was killed
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+
+    claimed_name = "cube.json.%s-%d.claimed" % (socket.gethostname(), dead.pid)
+    with open(os.path.join(spool_dir, claimed_name), "w") as file:
+        file.write(
+            json.dumps(
+                {
+                    "infile": helpers.get_test_file_location("cube.py"),
+                    "codec": "step",
+                    "outfile": "cube.step",
+                }
+            )
+        )
+
+    proc = subprocess.Popen(
+        [sys.executable, "src/cq_cli/main.py", "--spool-dir", spool_dir],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    try:
+        status = wait_for_status(spool_dir, "cube.json")
+        assert status["status"] == "success"
+        assert os.path.exists(os.path.join(spool_dir, "cube.json.done"))
+        assert not os.path.exists(os.path.join(spool_dir, claimed_name))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def test_spool_job_error(tmp_path):
+    """
+    Tests that a job which cannot be read is recorded as failed, and later jobs still run.
+    """
+    spool_dir = str(tmp_path)
+
+    # Opening the claimed job fails with an OSError in the worker
+    os.mkdir(os.path.join(spool_dir, "a.json"))
+
+    proc = subprocess.Popen(
+        [sys.executable, "src/cq_cli/main.py", "--spool-dir", spool_dir],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    try:
+        status = wait_for_status(spool_dir, "a.json")
+        assert status["status"] == "failed"
+        assert "Worker error" in status["stderr"]
+        assert os.path.exists(os.path.join(spool_dir, "a.json.done"))
+
+        submit_job(
+            spool_dir,
+            "b.json",
+            {
+                "infile": helpers.get_test_file_location("cube.py"),
+                "codec": "step",
+                "outfile": "b.step",
+            },
+        )
+        status = wait_for_status(spool_dir, "b.json")
+        assert status["status"] == "success"
+        assert proc.poll() == None
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def test_spool_stop_reaps_workers(tmp_path):
+    """
+    Tests that stopping the spooler with SIGTERM stops its pool of workers too.
+    """
+    if not os.path.isdir("/proc/self"):
+        pytest.skip("Processes cannot be listed from /proc on this platform")
+
+    spool_dir = str(tmp_path)
+    submit_job(
+        spool_dir,
+        "cube.json",
+        {"infile": helpers.get_test_file_location("cube.py"), "codec": "step"},
+    )
+
+    proc = subprocess.Popen(
+        [sys.executable, "src/cq_cli/main.py", "--spool-dir", spool_dir, "--jobs", "2"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    # Workers are started as jobs are handed to them
+    wait_for_status(spool_dir, "cube.json")
+    workers = helpers.child_pids(proc.pid)
+    proc.terminate()
+    proc.wait()
+
+    assert len(workers) >= 1
+    for pid in workers:
+        assert not os.path.exists("/proc/%d" % pid)
@@ -85,3 +85,27 @@ def test_step_codec_contains_geometry():
     assert exitcode == 0
     content = out.decode()
     assert "CLOSED_SHELL" in content
+
+
+def test_step_codec_assembly_to_file_with_other_extension(tmp_path):
+    """
+    Tests that an assembly is written straight to an outfile whose extension
+    does not match the codec name.
+    """
+    test_file = helpers.get_test_file_location("cube_assy.py")
+    out_path = tmp_path / "assy.stp"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(out_path),
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+    assert out_path.read_text().startswith("ISO-10303-21;")
@@ -1,5 +1,6 @@
 import os
 import sys
+import struct
 import tests.test_helpers as helpers
 
 
@@ -185,3 +186,96 @@ def test_stl_codec_binary():
     out, err, exitcode = helpers.cli_call(command)
 
     assert out[:5] != b"solid"
+
+
+def test_stl_codec_binary_matches_ascii(tmp_path):
+    """
+    Tests that binary STL output holds the same triangles as ASCII output.
+    """
+    test_file = helpers.get_test_file_location("sphere.py")
+    out_binary = tmp_path / "binary.stl"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "stl",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(out_binary),
+        "--outputopts",
+        "binary:True",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+    assert exitcode == 0
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "stl",
+        "--infile",
+        test_file,
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+    assert exitcode == 0
+
+    # A binary STL is an 80 byte header, a triangle count and 50 bytes per triangle
+    content = out_binary.read_bytes()
+    triangle_count = struct.unpack("<I", content[80:84])[0]
+    assert len(content) == 84 + 50 * triangle_count
+    assert triangle_count == out.decode().count("facet normal")
+
+
+def test_stl_codec_mesh_threads():
+    """
+    Tests that meshing with several threads gives the same STL as meshing with one.
+    """
+    test_file = helpers.get_test_file_location("cube_assy.py")
+
+    outputs = []
+    for threads in ("1", "4"):
+        command = [
+            sys.executable,
+            "src/cq_cli/main.py",
+            "--codec",
+            "stl",
+            "--infile",
+            test_file,
+            "--mesh-threads",
+            threads,
+        ]
+        out, err, exitcode = helpers.cli_call(command)
+
+        assert exitcode == 0
+        outputs.append(out)
+
+    assert outputs[0] == outputs[1]
+
+
+def test_stl_codec_lods(tmp_path):
+    """
+    Tests that several levels of detail can be written in one run.
+    """
+    test_file = helpers.get_test_file_location("sphere.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "stl",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(tmp_path / "sphere.stl"),
+        "--outputopts",
+        "lods:(0.5,0.01,0.1)",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+
+    # The levels go from the finest to the coarsest
+    sizes = [(tmp_path / f"sphere.lod{i}.stl").stat().st_size for i in range(3)]
+    assert sizes[0] > sizes[1] > sizes[2]
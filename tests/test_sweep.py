@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import time
+import pytest
+import tests.test_helpers as helpers
+from cq_cli import parallel, sweep
+
+
+def test_param_sweep_jsonl(tmp_path):
+    """
+    Tests that every row of a JSON lines sweep file is built and written to its own file.
+    """
+    test_file = helpers.get_test_file_location("cube_params.py")
+    sweep_path = tmp_path / "sweep.jsonl"
+    sweep_path.write_text('{"width": 1}\n{"width": 2}\n{"width": 3}\n')
+    manifest_path = tmp_path / "manifest.json"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(tmp_path / "out" / "cube_{width}.step"),
+        "--param-sweep",
+        str(sweep_path),
+        "--sweep-manifest",
+        str(manifest_path),
+        "--jobs",
+        "2",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 0
+
+    manifest = json.loads(manifest_path.read_text())
+    assert manifest["succeeded"] == 3
+    assert manifest["failed"] == 0
+
+    for width in (1, 2, 3):
+        step_path = tmp_path / "out" / ("cube_%d.step" % width)
+        assert step_path.read_text().startswith("ISO-10303-21;")
+
+    # Each row should have produced a different model
+    assert (tmp_path / "out" / "cube_1.step").read_text() != (
+        tmp_path / "out" / "cube_3.step"
+    ).read_text()
+
+
+def test_param_sweep_csv_with_failed_row(tmp_path):
+    """
+    Tests that a failing row is reported in the manifest without stopping the rest of the sweep.
+    """
+    test_file = helpers.get_test_file_location("cube_params.py")
+    sweep_path = tmp_path / "sweep.csv"
+    sweep_path.write_text("width\n1\n-1\n2\n")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(tmp_path / "cube_{index}.step"),
+        "--param-sweep",
+        str(sweep_path),
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    manifest = json.loads(out.decode())
+    results = manifest["results"]
+
+    assert exitcode == 100
+    assert manifest["succeeded"] == 2
+    assert results[0]["success"] and results[2]["success"]
+    assert not results[1]["success"]
+    assert results[1]["exit_code"] == 100
+    assert (tmp_path / "cube_2.step").exists()
+
+
+def test_param_sweep_crashed_worker(tmp_path):
+    """
+    Tests that a row which kills its worker is reported as failed, and the other rows still run.
+    """
+    script_path = tmp_path / "crash.py"
+    script_path.write_text(
+        "import os\n"
+        "import cadquery as cq\n"
+        "width = 1\n"
+        "if width < 0:\n"
+        "    os._exit(3)\n"
+        "show_object(cq.Workplane().box(width, 1, 1))\n"
+    )
+    sweep_path = tmp_path / "sweep.jsonl"
+    sweep_path.write_text('{"width": 1}\n{"width": -1}\n{"width": 2}\n{"width": 3}\n')
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        str(script_path),
+        "--outfile",
+        str(tmp_path / "cube_{index}.step"),
+        "--param-sweep",
+        str(sweep_path),
+        "--jobs",
+        "2",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    manifest = json.loads(out.decode())
+    results = manifest["results"]
+
+    assert exitcode == 1
+    assert manifest["succeeded"] == 3
+    assert not results[1]["success"]
+    assert "Worker error" in results[1]["error"]
+    for index in (0, 2, 3):
+        assert (tmp_path / ("cube_%d.step" % index)).exists()
+
+
+class PidSweep:
+    """
+    Stands in for a Sweep, recording which process ran each row and crashing on rows that ask to.
+    """
+
+    def run_row(self, index, row):
+        if row.get("crash"):
+            os._exit(3)
+        time.sleep(0.2)
+        return {"index": index, "success": True, "exit_code": 0, "pid": os.getpid()}
+
+
+def test_param_sweep_retries_on_full_pool():
+    """
+    Tests that after a row crashes its worker, only that row is run on its own and the
+    others go back to being spread over every worker.
+    """
+    if not parallel.can_fork():
+        pytest.skip("fork is not available on this platform")
+
+    rows = [{}, {"crash": True}] + [{} for _ in range(8)]
+    records = sweep.run_sweep(PidSweep(), rows, 2)
+
+    assert records[1]["exit_code"] == 1
+    assert "Worker error" in records[1]["error"]
+    assert all(record["success"] for i, record in enumerate(records) if i != 1)
+    assert len(set(record["pid"] for record in records[2:])) >= 2
+
+
+def test_param_sweep_rejects_results(tmp_path):
+    """
+    Tests that --results is refused with --param-sweep rather than ignored.
+    """
+    sweep_path = tmp_path / "sweep.jsonl"
+    sweep_path.write_text('{"width": 1}\n')
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "step",
+        "--infile",
+        helpers.get_test_file_location("cube_params.py"),
+        "--outfile",
+        str(tmp_path / "cube_{index}.step"),
+        "--param-sweep",
+        str(sweep_path),
+        "--results",
+        "each",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+
+    assert exitcode == 2
+    assert "--results" in err.decode()
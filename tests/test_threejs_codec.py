@@ -1,4 +1,9 @@
+import re
 import sys
+import json
+import base64
+import struct
+import pytest
 import tests.test_helpers as helpers
 
 
@@ -25,3 +30,124 @@ def test_threejs_codec():
     assert (
         out.decode().split("\n")[6].replace("\r", "") == '        "faces"         : 12,'
     )
+
+
+def test_threejs_codec_shares_tessellation_with_stl(tmp_path):
+    """
+    Tests that exporting STL and ThreeJS in one run, which shares one triangulation,
+    gives the same ThreeJS output as exporting it on its own.
+    """
+    test_file = helpers.get_test_file_location("sphere.py")
+    stl_path = tmp_path / "sphere.stl"
+    tjs_path = tmp_path / "sphere.json"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "stl;threejs",
+        "--infile",
+        test_file,
+        "--outfile",
+        f"{stl_path};{tjs_path}",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+    assert exitcode == 0
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "threejs",
+        "--infile",
+        test_file,
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+    assert exitcode == 0
+
+    assert tjs_path.read_text().strip() == out.decode().strip()
+
+
+def test_threejs_codec_compact(tmp_path):
+    """
+    Tests that the compact ThreeJS output is smaller and holds the same triangles.
+    """
+    test_file = helpers.get_test_file_location("sphere.py")
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "threejs",
+        "--infile",
+        test_file,
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+    assert exitcode == 0
+    verbose = out.decode()
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "threejs",
+        "--infile",
+        test_file,
+        "--outputopts",
+        "compact:True",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+    assert exitcode == 0
+    compact = json.loads(out.decode())
+
+    assert len(out) < len(verbose)
+    assert compact["metadata"]["type"] == "CQCompactGeometry"
+
+    # Positions decode to the bounding box of the model
+    data = compact["data"]
+    position_bytes = base64.b64decode(data["attributes"]["position"]["base64"])
+    positions = struct.unpack("<%dH" % (len(position_bytes) // 2), position_bytes)
+    box_min = data["boundingBox"]["min"]
+    box_max = data["boundingBox"]["max"]
+    for axis in range(3):
+        coordinates = [
+            box_min[axis] + q / 65535 * (box_max[axis] - box_min[axis])
+            for q in positions[axis::3]
+        ]
+        assert min(coordinates) == pytest.approx(box_min[axis])
+        assert max(coordinates) == pytest.approx(box_max[axis])
+
+    # Each triangle is three indices
+    index = compact["data"]["index"]
+    index_bytes = base64.b64decode(index["base64"])
+    index_size = 2 if index["type"] == "Uint16Array" else 4
+    face_count = int(re.search(r'"faces"\s*:\s*(\d+)', verbose).group(1))
+    assert len(index_bytes) // (3 * index_size) <= face_count
+
+
+def test_threejs_codec_compact_external_buffers(tmp_path):
+    """
+    Tests that the compact ThreeJS arrays can be written to a .bin file next to the output.
+    """
+    test_file = helpers.get_test_file_location("cube.py")
+    out_path = tmp_path / "cube.json"
+
+    command = [
+        sys.executable,
+        "src/cq_cli/main.py",
+        "--codec",
+        "threejs",
+        "--infile",
+        test_file,
+        "--outfile",
+        str(out_path),
+        "--outputopts",
+        "compact:True;externalBuffers:True",
+    ]
+    out, err, exitcode = helpers.cli_call(command)
+    assert exitcode == 0
+
+    document = json.loads(out_path.read_text())
+    position = document["data"]["attributes"]["position"]
+    assert position["uri"] == "cube.bin"
+    assert (tmp_path / "cube.bin").stat().st_size >= position["byteLength"]
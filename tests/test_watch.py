@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import subprocess
+from cq_cli import watch
+
+
+def wait_for_output(outfile, previous=None):
+    """
+    Waits for the watched conversion to write output that differs from what it wrote before.
+    """
+    # Importing CadQuery can take a while, so give the first conversion some time
+    for _ in range(600):
+        if os.path.exists(outfile):
+            with open(outfile, "r") as file:
+                content = file.read()
+            if content != "" and content != previous:
+                return content
+        time.sleep(0.1)
+
+    return None
+
+
+def test_watch_reloads_user_modules(tmp_path):
+    """
+    Tests that --watch converts the script again when a module it imports is edited.
+    """
+    module_file = tmp_path / "dims.py"
+    module_file.write_text("size = 1\n")
+
+    script_file = tmp_path / "model.py"
+    script_file.write_text(
+        "\n".join(
+            [
+                "import cadquery as cq",
+                "import dims",
+                "show_object(cq.Workplane().box(dims.size, dims.size, dims.size))",
+            ]
+        )
+    )
+    outfile = str(tmp_path / "model.stl")
+
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "src/cq_cli/main.py",
+            "--watch",
+            "--codec",
+            "stl",
+            "--infile",
+            str(script_file),
+            "--outfile",
+            outfile,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    try:
+        first = wait_for_output(outfile)
+        assert first != None
+
+        # Make sure the modification time moves on even on coarse filesystems
+        time.sleep(1)
+        module_file.write_text("size = 5\n")
+
+        second = wait_for_output(outfile, first)
+        assert second != None
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def test_watch_only_imported_modules(tmp_path):
+    """
+    Tests that --watch watches the modules the script imported, not every file next to it.
+    """
+    (tmp_path / "dims.py").write_text("size = 1\n")
+    (tmp_path / "unrelated.py").write_text("size = 2\n")
+
+    script_file = tmp_path / "model.py"
+    script_file.write_text(
+        "\n".join(
+            [
+                "import cadquery as cq",
+                "import dims",
+                "show_object(cq.Workplane().box(dims.size, dims.size, dims.size))",
+            ]
+        )
+    )
+    outfile = str(tmp_path / "model.stl")
+
+    module_files = set()
+    state = watch.rebuild(
+        ["--codec", "stl", "--infile", str(script_file), "--outfile", outfile],
+        str(script_file),
+        None,
+        module_files,
+    )
+
+    assert module_files == {str(tmp_path / "dims.py")}
+    assert sorted(state) == sorted([str(script_file), str(tmp_path / "dims.py")])
+    assert "dims" not in sys.modules